@@ -2,36 +2,75 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Body
+from fastapi.responses import ORJSONResponse, StreamingResponse
 import uvicorn
 from chefai import ChefAI
+from batcher import BatchRunner
 
-app = FastAPI(title="ChefAI Agent", description="Mistral+Phi3 Dual Agent")
+app = FastAPI(title="ChefAI Agent", description="Mistral+Phi3 Dual Agent", default_response_class=ORJSONResponse)
 
 print("🏗️ Booting up ChefAI... (This takes ~1 min)")
 # Initialize the bot once when the server starts
 bot = ChefAI()
+# Concurrent /chat requests share batched generate() calls
+bot.batcher = BatchRunner(bot)
+
+# Dedicated threads for the blocking router pipeline. Generations go through
+# the batcher's worker; the single forward passes these threads run themselves
+# (classification, prefix warm-ups) take the same per-model lock as its
+# generate() calls (ChefAI._model_lock).
+INFER_EXECUTOR = ThreadPoolExecutor(max_workers=bot.batcher.max_batch_size)
+
+def parse_payload(payload):
+    """
+    Minimal check of the tiny chat payload (skips Pydantic model validation).
+    Returns (text, session_id).
+    """
+    text = payload.get("text")
+    if not isinstance(text, str):
+        raise HTTPException(status_code=422, detail="'text' must be a string")
 
-class UserInput(BaseModel):
-    text: str
     # If the frontend doesn't send one, default to "default"
-    session_id: str = "default" 
+    session_id = str(payload.get("session_id") or "default")
+    return text, session_id
 
 @app.get("/")
 def home():
     return {"status": "Online", "message": "ChefAI is ready to cook!"}
 
 @app.post("/chat")
-def chat_endpoint(request: UserInput):
+async def chat_endpoint(payload: dict = Body(...)):
+    text, session_id = parse_payload(payload)
     try:
-        # Pass the unique ticket number (session_id) to the router
-        response = bot.router(request.text, request.session_id)
+        # Pass the unique ticket number (session_id) to the router, off the event loop
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(INFER_EXECUTOR, bot.router, text, session_id)
         return {"response": response}
     except Exception as e:
         # Print error to terminal for debugging
         print(f"❌ API Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+def chat_stream_endpoint(payload: dict = Body(...)):
+    """
+    Server-Sent Events version of /chat: the answer arrives as it's generated.
+    """
+    text, session_id = parse_payload(payload)
+
+    def event_stream():
+        try:
+            for chunk in bot.router_stream(text, session_id):
+                yield f"data: {json.dumps(chunk)}\n\n"
+        except Exception as e:
+            print(f"❌ API Error: {str(e)}")
+            yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
\ No newline at end of file
@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchRunner:
+    """
+    Dynamic micro-batcher for ChefAI.run_inference.
+
+    Every session's router runs in its own server thread and submits its LLM
+    calls here. A single worker thread waits a few milliseconds to collect
+    concurrent prompts, groups the ones that target the same model with the
+    same generation settings, and runs each group as one padded generate()
+    call. Other GPU calls on a model (classification forwards, prefix
+    warm-ups) run on the callers' threads, serialised with these generate()
+    calls by the model's lock (ChefAI._model_lock). Token budgets don't split groups, the call runs
+    to the largest one and each output is cut to its own.
+    """
+
+    def __init__(self, bot, max_batch_size=8, max_wait_ms=10):
+        self.bot = bot
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+
+    def submit(self, model, tokenizer, prompt, **gen_kwargs):
+        """
+        Queues one prompt. Returns a Future resolving to the generated text.
+        """
+        future = Future()
+        self.queue.put((model, tokenizer, prompt, gen_kwargs, future))
+        return future
+
+    def _collect(self):
+        """
+        Blocks for the first request, then gathers whatever else arrives
+        within the wait window (up to max_batch_size).
+        """
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+
+            # Grouping by target model + generation settings
+            groups = {}
+            for item in batch:
+                model, _, _, gen_kwargs, _ = item
+                key = (id(model), self._settings_key(gen_kwargs))
+                groups.setdefault(key, []).append(item)
+
+            for items in groups.values():
+                self._run_group(items)
+
+    @staticmethod
+    def _settings_key(gen_kwargs):
+        """
+        Hashable key of generation settings (max_tokens aside). Objects
+        (streamers, prefix cache entries) only group with themselves.
+        """
+        plain = (str, int, float, bool, type(None), list, tuple)
+        return repr(sorted(
+            (name, value if isinstance(value, plain) else id(value))
+            for name, value in gen_kwargs.items() if name != "max_tokens"
+        ))
+
+    def _run_group(self, items):
+        model, tokenizer, _, gen_kwargs, _ = items[0]
+        prompts = [item[2] for item in items]
+
+        limits = [item[3].get("max_tokens", 512) for item in items]
+        if len(set(limits)) > 1:
+            gen_kwargs = {**gen_kwargs, "max_tokens": limits}
+
+        try:
+            outputs = self.bot._generate(model, tokenizer, prompts, **gen_kwargs)
+        except Exception as e:
+            for item in items:
+                item[4].set_exception(e)
+            return
+
+        for item, output in zip(items, outputs):
+            item[4].set_result(output)
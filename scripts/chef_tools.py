@@ -4,6 +4,14 @@ import json
 import os
 from sentence_transformers import SentenceTransformer
 import numpy as np
+import re
+import threading
+from collections import OrderedDict, Counter, defaultdict
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
 
 class ChefTools:
     def __init__(self):
@@ -12,8 +20,8 @@ class ChefTools:
         self.db_path = os.path.join(self.base_path, "../chroma_db")
         self.json_path = os.path.join(self.base_path, "../data/knowledge/culinary_constants.json")
 
-        # Embedding model
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+        # Embedding model (ONNX int8 on CPU, PyTorch as fallback)
+        self.embedder = self._load_embedder()
 
         # ChromaDB connection
         self.client = chromadb.PersistentClient(path=self.db_path)
@@ -22,6 +30,24 @@ class ChefTools:
         self.recipe_collection = self.client.get_collection("chef_cookbook")
         self.safety_collection = self.client.get_collection("chef_safety")
 
+        # In-memory FAISS copies of the (static) collections, keyed by name
+        self._indexes = {}
+        if faiss is not None:
+            for collection in (self.recipe_collection, self.safety_collection):
+                self._indexes[collection.name] = self._build_index(collection)
+        else:
+            print("  FAISS not installed, searching ChromaDB directly.")
+
+        # Query embedding cache (LRU)
+        self._embed_cache = OrderedDict()
+        self._embed_cache_size = 512
+        self._embed_lock = threading.Lock()
+
+        # Lookup result cache (LRU), the collections and constants are static
+        self._result_cache = OrderedDict()
+        self._result_cache_size = 1024
+        self._result_lock = threading.Lock()
+
         # Loading constants JSON to memory
         try:
             with open(self.json_path, 'r') as file:
@@ -30,21 +56,160 @@ class ChefTools:
             print(f"  Constants file not found at {self.json_path}")
             self.constants_data = {}
 
+        # Prebuilt lookups for constants search
+        self._lower_keys = {key.lower(): key for key in self.constants_data}
+        self._token_index = defaultdict(list)
+        for lower_key, key in self._lower_keys.items():
+            for token in set(self._tokenize(lower_key)):
+                self._token_index[token].append(key)
+
+    @staticmethod
+    def _load_embedder():
+        """
+        Loads MiniLM through the ONNX Runtime backend using the int8
+        (AVX-512 VNNI) export shipped with the model. Falls back to the
+        PyTorch backend if ONNX Runtime isn't installed.
+        """
+        try:
+            return SentenceTransformer(
+                'all-MiniLM-L6-v2',
+                device='cpu',
+                backend='onnx',
+                model_kwargs={"file_name": "onnx/model_qint8_avx512_vnni.onnx"}
+            )
+        except Exception as e:
+            print(f"  ONNX embedder unavailable ({e}), using PyTorch backend.")
+            return SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+
+    @staticmethod
+    def _tokenize(text):
+        """
+        Splits lowercase text on whitespace/punctuation (including '_').
+        """
+        return re.findall(r"[a-z0-9]+", text)
+
+    def embed_queries(self, queries):
+        """
+        Embeds a list of queries, memoized by their normalized text.
+        Cache misses are encoded together in a single batched call.
+        Returns a list of vectors in ChromaDB's query_embeddings format.
+        """
+        keys = [query.strip().lower() for query in queries]
+
+        # Cache hits (the lock guards the LRU against concurrent callers)
+        found = {}
+        with self._embed_lock:
+            for key in keys:
+                if key in self._embed_cache:
+                    self._embed_cache.move_to_end(key)
+                    found[key] = self._embed_cache[key]
+
+        # Encoding only the queries we haven't seen yet, outside the lock
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        if missing:
+            vectors = self.embedder.encode(missing).tolist()
+            found.update(zip(missing, vectors))
+
+            with self._embed_lock:
+                for key, vector in zip(missing, vectors):
+                    self._embed_cache[key] = vector
+                # Evicting the least recently used queries
+                while len(self._embed_cache) > self._embed_cache_size:
+                    self._embed_cache.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def _embed(self, query):
+        """
+        Embeds a single query (cached).
+        """
+        return self.embed_queries([query])
+
+    def _cached(self, kind, query, n_results, compute):
+        """
+        Returns a memoized lookup result keyed by its kind + normalized query,
+        computing (and storing) it on a miss.
+        """
+        key = (kind, query.strip().lower(), n_results)
+        with self._result_lock:
+            if key in self._result_cache:
+                self._result_cache.move_to_end(key)
+                return self._result_cache[key]
+
+        result = compute()
+
+        with self._result_lock:
+            self._result_cache[key] = result
+            # Evicting the least recently used lookups
+            while len(self._result_cache) > self._result_cache_size:
+                self._result_cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _build_index(collection, hnsw_threshold=100_000):
+        """
+        Loads every vector + payload of a ChromaDB collection into FAISS.
+        Vectors are L2-normalized so inner product equals cosine similarity.
+        Uses exact search for small collections and HNSW above the threshold.
+        """
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        vectors = np.asarray(data['embeddings'], dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) == 0:
+            return None
+
+        faiss.normalize_L2(vectors)
+
+        dim = vectors.shape[1]
+        if len(vectors) < hnsw_threshold:
+            index = faiss.IndexFlatIP(dim)
+        else:
+            index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        index.add(vectors)
+
+        print(f"  Loaded {index.ntotal} vectors from '{collection.name}' into FAISS.")
+        return {
+            "index": index,
+            "documents": data['documents'],
+            "metadatas": data['metadatas']
+        }
+
+    def _query(self, collection, query_embeddings, n_results, include):
+        """
+        Searches the FAISS copy of a collection when available, otherwise ChromaDB.
+        Returns results shaped like ChromaDB's, one row per query.
+        """
+        store = self._indexes.get(collection.name)
+        if store is None:
+            return collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                include=list(include)
+            )
+
+        vectors = np.asarray(query_embeddings, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        _, indices = store["index"].search(vectors, n_results)
+
+        results = {}
+        for field in include:
+            # FAISS pads missing neighbours with -1
+            results[field] = [[store[field][i] for i in row if i >= 0] for row in indices]
+        return results
+
     def get_recipes(self, query, n_results=3):
         """
-        Searches the recipe collection.
+        Searches the recipe collection (cached per query).
         Returns a formatted string of top N recipes.
         """
+        return self._cached("recipes", query, n_results, lambda: self._get_recipes(query, n_results))
 
-        # Embedding the query, then turning into list for ChromaDB
-        query_embedding = self.embedder.encode([query]).tolist()
+    def _get_recipes(self, query, n_results):
+
+        # Embedding the query (cached), only on a result cache miss
+        query_embedding = self._embed(query)
 
         # Querying the collection
-        results = self.recipe_collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results,
-            include=["documents", "metadatas"]
-        )
+        results = self._query(self.recipe_collection, query_embedding, n_results, ["documents", "metadatas"])
 
         # Parsing results
         metadatas = results['metadatas'][0]
@@ -70,19 +235,18 @@ Instructions: {steps}
     
     def check_safety(self, query, n_results=2):
         """
-        Searches the safety collection.
+        Searches the safety collection (cached per query).
         Returns a string of relevant safety rules.
         """
+        return self._cached("safety", query, n_results, lambda: self._check_safety(query, n_results))
+
+    def _check_safety(self, query, n_results):
 
-        # Embedding the query, turning it into list for ChromaDB
-        query_embedding = self.embedder.encode([query]).tolist()
+        # Embedding the query (cached), only on a result cache miss
+        query_embedding = self._embed(query)
 
         # Querying the collection
-        results = self.safety_collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results,
-            include=["documents"]
-        )
+        results = self._query(self.safety_collection, query_embedding, n_results, ["documents"])
 
         # Formatting output using documents
         documents = results['documents'][0]
@@ -94,16 +258,26 @@ Instructions: {steps}
     
     def search_constants(self, query):
         """
-        Searches the JSON data for conversions and substitutions.
+        Searches the JSON data for conversions and substitutions (cached per query).
         """
+        return self._cached("constants", query, None, lambda: self._search_constants(query))
+
+    def _search_constants(self, query):
+
+        query_lower = query.lower().strip()
+
+        # Exact key match goes first
+        exact = self._lower_keys.get(query_lower)
 
-        query_lower = query.lower()
-        found_items = []
+        # Ranking keys by how many query tokens they share
+        hits = Counter()
+        for token in set(self._tokenize(query_lower)):
+            for key in self._token_index.get(token, []):
+                hits[key] += 1
 
-        # String matching
-        for key, value in self.constants_data.items():
-            if query_lower in key.lower():
-                found_items.append(f"{key}: {value}")
+        matched_keys = [exact] if exact else []
+        matched_keys += [key for key, _ in hits.most_common() if key != exact]
 
-        return "\n".join(found_items[:3]) if found_items else ""
+        found_items = [f"{key}: {self.constants_data[key]}" for key in matched_keys[:3]]
 
+        return "\n".join(found_items) if found_items else ""
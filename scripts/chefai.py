@@ -1,8 +1,177 @@
 import torch
+import numpy as np
 from unsloth import FastLanguageModel
+from transformers import DynamicCache, TextIteratorStreamer
 from chef_tools import ChefTools
+from prompts import (
+    WAITER_PREFIXES, CHEF_PREFIXES, CHAT_TEMPLATE, ROUTER_TEMPLATE, FOOD_TEMPLATE, SAFETY_TEMPLATE, CONSTANTS_TEMPLATE,
+    INSTRUCT_TEMPLATE, EXTRACTION_TEMPLATE, BRAIN_TEMPLATE, IDEATION_WARM_TEMPLATE, IDEATION_COLD_TEMPLATE,
+    RECIPE_TEMPLATE
+)
 import os
-import textwrap
+import re
+import copy
+import contextlib
+import uuid
+import asyncio
+import queue
+import threading
+import importlib.util
+import hashlib
+import transformers
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Faster matmul/conv kernels on Ampere+ (TF32 + cuDNN autotuning)
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.benchmark = True
+
+class AdapterView:
+    """
+    One role (LoRA adapter) of a shared PEFT backbone.
+    Activates its adapter before every forward/generate call, so Chef and
+    Waiter can live on a single set of base weights.
+    """
+    def __init__(self, model, adapter_name):
+        self.model = model
+        self.adapter_name = adapter_name
+
+    def generate(self, *args, **kwargs):
+        self.model.set_adapter(self.adapter_name)
+        return self.model.generate(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        self.model.set_adapter(self.adapter_name)
+        return self.model(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+class CharBudgetCriteria(transformers.StoppingCriteria):
+    """
+    Stops generating once the new text of every row is at least max_chars
+    characters long. Only decodes every few tokens, decoding isn't free.
+    """
+    def __init__(self, tokenizer, prompt_len, max_chars, every=16):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+        self.max_chars = max_chars
+        self.every = every
+
+    def __call__(self, input_ids, scores, **kwargs):
+        new_tokens = input_ids.shape[-1] - self.prompt_len
+        done = new_tokens > 0 and new_tokens % self.every == 0 and all(
+            len(self.tokenizer.decode(row[self.prompt_len:], skip_special_tokens=True)) >= self.max_chars
+            for row in input_ids
+        )
+        return torch.full((input_ids.shape[0],), done, dtype=torch.bool, device=input_ids.device)
+
+class SegmentedPrompt:
+    """
+    A prompt given as parts: strings, and token id lists already tokenized in
+    context (e.g. the chat history). On the prefix-cached path only the
+    strings go through the tokenizer; text is the whole prompt as a string.
+    """
+    def __init__(self, parts, text):
+        self.parts = parts
+        self.text = text
+
+class RemoteModel:
+    """
+    A model served by an OpenAI-compatible completions server (vLLM), used in
+    place of a local model. Concurrent requests are batched by the server.
+    """
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def complete(self, prompt, max_tokens=512, repeat_penalty=1.1, temperature=0.6, stop_strings=None, prefix=None, on_chunk=None):
+        """
+        Completes one prompt. on_chunk, if given, gets the text chunk by chunk
+        as it's generated.
+        """
+        if isinstance(prompt, SegmentedPrompt):
+            prompt = prompt.text
+
+        kwargs = {
+            "model": self.name,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stop": stop_strings,
+            # Same as HF stop_strings: keep the stop string in the output
+            "extra_body": {"repetition_penalty": repeat_penalty, "include_stop_str_in_output": True}
+        }
+
+        if on_chunk is None:
+            response = self.client.completions.create(**kwargs)
+            return response.choices[0].text.strip()
+
+        chunks = []
+        for event in self.client.completions.create(stream=True, **kwargs):
+            text = event.choices[0].text if event.choices else ""
+            if text:
+                chunks.append(text)
+                on_chunk(text)
+        return "".join(chunks).strip()
+
+class EngineModel:
+    """
+    A model running in-process on a vLLM AsyncLLMEngine (PagedAttention,
+    continuous batching, prefix caching), used in place of a local model.
+    Handler threads schedule their requests on one shared event loop thread.
+    """
+    _loop = None
+
+    def __init__(self, model_path, **engine_kwargs):
+        from vllm import AsyncEngineArgs, AsyncLLMEngine
+
+        if EngineModel._loop is None:
+            EngineModel._loop = asyncio.new_event_loop()
+            threading.Thread(target=EngineModel._loop.run_forever, daemon=True).start()
+
+        self.engine = AsyncLLMEngine.from_engine_args(AsyncEngineArgs(model=model_path, **engine_kwargs))
+        self.lora_request = None
+
+    def with_lora(self, adapter_name, adapter_path):
+        """
+        Another role on the same engine, served through a LoRA adapter (the
+        engine needs enable_lora). Both roles share the weights and KV pool.
+        """
+        from vllm.lora.request import LoRARequest
+
+        view = copy.copy(self)
+        view.lora_request = LoRARequest(adapter_name, 1, adapter_path)
+        return view
+
+    def complete(self, prompt, max_tokens=512, repeat_penalty=1.1, temperature=0.6, stop_strings=None, prefix=None, on_chunk=None):
+        """
+        Same as RemoteModel.complete().
+        """
+        from vllm import SamplingParams
+
+        params = SamplingParams(
+            max_tokens=max_tokens,
+            # Same greedy cut-off as the local generate()
+            temperature=temperature if temperature > 0.15 else 0.0,
+            repetition_penalty=repeat_penalty,
+            stop=stop_strings,
+            include_stop_str_in_output=True
+        )
+
+        return asyncio.run_coroutine_threadsafe(self._generate(prompt, params, on_chunk), self._loop).result()
+
+    async def _generate(self, prompt, params, on_chunk):
+        if isinstance(prompt, SegmentedPrompt):
+            prompt = prompt.text
+
+        text = ""
+        async for output in self.engine.generate(prompt, params, request_id=uuid.uuid4().hex, lora_request=self.lora_request):
+            new_text = output.outputs[0].text
+            if on_chunk is not None and len(new_text) > len(text):
+                on_chunk(new_text[len(text):])
+            text = new_text
+        return text.strip()
 
 class ChefAI:
     def __init__(self):
@@ -15,115 +184,1109 @@ class ChefAI:
         self.chef_path = os.path.join(os.path.dirname(__file__), "../models/mistral_qlora")
         self.waiter_name = "unsloth/Phi-3-mini-4k-instruct"
 
-        # Loading main model
-        print("🍳 Loading Chef model...")
-        self.chef_model, self.chef_tokenizer = FastLanguageModel.from_pretrained(
-            model_name=self.chef_path,
-            max_seq_length=2048,
-            dtype=None,
-            load_in_4bit=True,
+        # Optional Waiter LoRA trained on the Chef's base model. When set, the
+        # Waiter is served as a second adapter on the Chef backbone instead of
+        # loading Phi-3, saving several GB of VRAM (with vllm_engines, as a LoRA
+        # of a single engine). (The adapter must be trained on the Waiter
+        # prompts in prompts.py.)
+        self.waiter_adapter = None
+
+        # Optional pre-quantized AWQ checkpoints (merged Chef / Phi-3), made offline
+        # with `autoawq`. Loaded with fused exllama-v2 int4 kernels instead of
+        # bitsandbytes' on-the-fly dequantization.
+        self.chef_awq_path = None
+        self.waiter_awq_path = None
+
+        # Without an AWQ checkpoint, bitsandbytes NF4 weights are dequantized on
+        # every matmul and decode slower than plain bf16 ones. Set to False to
+        # load bf16 weights when the VRAM allows (~8 GB Phi-3, ~15 GB Mistral).
+        self.load_in_4bit = True
+
+        # torch.compile the Waiter forward over a static KV cache (CUDA graphs).
+        # First calls pay the compilation; replaces the Waiter preamble cache.
+        # Prompts are left padded up to a length bucket so compiled graphs get reused.
+        self.compile_waiter = False
+        self.compile_buckets = (64, 128, 256, 512, 1024, 2048)
+        # Buckets compiled during the warmup instead of on the first user requests
+        # (most Waiter prompts, history included, land in these)
+        self.compile_warmup_buckets = (128, 256, 512)
+
+        # Optional OpenAI-compatible servers (e.g. `vllm serve`) hosting the models,
+        # continuous batching across sessions happens server side. Role -> (base
+        # url, served model name) for both roles, e.g.
+        # {"chef": ("http://localhost:8002/v1", "chef"), "waiter": ("http://localhost:8001/v1", "waiter")}
+        # When set, no model is loaded locally.
+        self.llm_servers = {}
+
+        # Or run both models in-process on vLLM AsyncLLMEngines (PagedAttention KV,
+        # continuous batching). vllm_models: role -> checkpoint (merged Chef).
+        # vLLM's defaults (256 sequences, CUDA graphs for batches up to that) are
+        # sized for big serving, a few concurrent sessions need far less.
+        # ("kv_cache_dtype": "fp8" halves the KV again on GPUs that support it)
+        self.vllm_engines = False
+        self.vllm_models = {"chef": self.chef_path, "waiter": self.waiter_name}
+        self.vllm_engine_args = {
+            "quantization": "bitsandbytes",
+            "max_model_len": 2048,
+            "max_num_seqs": 4,
+            "gpu_memory_utilization": 0.45,
+            "enable_prefix_caching": True
+        }
+
+        # Transformers models in this process (everything below that touches
+        # weights, tokenizers or KV caches only applies to them)
+        self._local_models = not (self.llm_servers or self.vllm_engines)
+
+        # Speculative decoding of Chef generations with the Waiter as draft model
+        # (assisted generation; the two tokenizers differ, so it needs a
+        # transformers version with universal assisted decoding)
+        self.speculative_chef = False
+        self.num_speculative_tokens = 5
+
+        # Return the Brain's output directly when it already looks presentable,
+        # skipping the Waiter rephrase generation
+        self.skip_clean_rephrase = True
+
+        # Format recipes into Markdown in Python, the Waiter plating only runs
+        # when the recipe can't be parsed into ingredients and steps
+        self.python_plating = True
+
+        if self.llm_servers:
+            # Both models live on the servers, no local weights/tokenizers
+            from openai import OpenAI
+            print("🌐 Connecting to the LLM servers...")
+            self.chef_model, self.waiter_model = [
+                RemoteModel(OpenAI(base_url=url, api_key="EMPTY"), name)
+                for url, name in (self.llm_servers["chef"], self.llm_servers["waiter"])
+            ]
+            self.chef_tokenizer = self.waiter_tokenizer = None
+        elif self.vllm_engines and self.waiter_adapter:
+            # One engine, the Waiter is a LoRA on the Chef: a single copy of the
+            # weights, and the whole memory budget goes to one KV pool
+            print("🚀 Starting vLLM engine (Waiter adapter on the Chef)...")
+            engine_args = {
+                **self.vllm_engine_args,
+                "enable_lora": True,
+                "gpu_memory_utilization": 2 * self.vllm_engine_args["gpu_memory_utilization"]
+            }
+            self.chef_model = EngineModel(self.vllm_models["chef"], **engine_args)
+            self.waiter_model = self.chef_model.with_lora("waiter", self.waiter_adapter)
+            self.chef_tokenizer = self.waiter_tokenizer = None
+        elif self.vllm_engines:
+            print("🚀 Starting vLLM engines...")
+            self.chef_model = EngineModel(self.vllm_models["chef"], **self.vllm_engine_args)
+            self.waiter_model = EngineModel(self.vllm_models["waiter"], **self.vllm_engine_args)
+            self.chef_tokenizer = self.waiter_tokenizer = None
+        else:
+            # Loading main model
+            print("🍳 Loading Chef model...")
+            self.chef_model, self.chef_tokenizer = self._load_model(self.chef_path, self.chef_awq_path)
+
+            # Loading waiter model
+            if self.waiter_adapter:
+                print("🧑‍🍳 Loading Waiter adapter on the Chef backbone...")
+                backbone = self.chef_model
+                backbone.load_adapter(self.waiter_adapter, adapter_name="waiter")
+                self.chef_model = AdapterView(backbone, backbone.active_adapter)
+                self.waiter_model = AdapterView(backbone, "waiter")
+                self.waiter_tokenizer = self.chef_tokenizer
+            else:
+                print("🧑‍🍳 Loading Waiter model...")
+                self.waiter_model, self.waiter_tokenizer = self._load_model(self.waiter_name, self.waiter_awq_path)
+
+            if self.speculative_chef and self.waiter_adapter is None:
+                self.waiter_model.generation_config.num_assistant_tokens = self.num_speculative_tokens
+
+            if self.compile_waiter:
+                print("⚙️ Compiling Waiter decode step...")
+                self.waiter_model.generation_config.cache_implementation = "static"
+                self.waiter_model.forward = torch.compile(self.waiter_model.forward, mode="reduce-overhead", fullgraph=False)
+
+        # GPU calls on a set of weights (generate, classification and prefix
+        # forwards) run one at a time, whichever thread makes them (batcher
+        # worker, router threads, streaming executor). A Waiter adapter shares
+        # the Chef backbone and its active adapter, both roles then share a lock.
+        # Calls needing both (Waiter-assisted Chef) take the Chef's lock first.
+        chef_lock = threading.RLock()
+        self._model_locks = {
+            id(self.chef_model): chef_lock,
+            id(self.waiter_model): chef_lock if self.waiter_adapter else threading.RLock()
+        }
+
+        # Prefix KV cache for the static Waiter preambles
+        # (AWQ fused layers, the compiled static cache, LLM servers and vLLM engines manage their own KV)
+        self.use_prefix_cache = self.waiter_awq_path is None and not self.compile_waiter and self._local_models
+        self.prefix_cache = {}
+        # Preamble KVs are also persisted here so restarts skip their prefill
+        self._kv_store_dir = os.path.join(os.path.dirname(__file__), "../.kv_cache")
+        if self.use_prefix_cache:
+            print("⚡ Precomputing Waiter prompt prefixes...")
+            for name, prefix in WAITER_PREFIXES.items():
+                self.prefix_cache[name] = self._build_prefix_cache(
+                    self.waiter_model, self.waiter_tokenizer, prefix
+                )
+
+        # Same for the Chef few-shot examples
+        if self.chef_awq_path is None and self._local_models:
+            print("⚡ Precomputing Chef prompt prefixes...")
+            for name, prefix in CHEF_PREFIXES.items():
+                self.prefix_cache[name] = self._build_prefix_cache(
+                    self.chef_model, self.chef_tokenizer, prefix
+                )
+
+        # Keep the KV of the last few Waiter calls and reuse the longest shared
+        # token prefix on the next ones (previous chat turn -> only the new
+        # history lines and input get prefilled). Costs VRAM: ~0.4 MB/token on Phi-3.
+        self.reuse_turn_kv = False
+        self.turn_kv_entries = 4
+        self._turn_kv = OrderedDict()
+        self._turn_kv_lock = threading.Lock()
+
+        # Quantized KV cache (needs `hqq`, or `optimum-quanto` for the "quanto"
+        # backend, which only does 2/4 bits), only worth it on long generations.
+        # Waiter only unless quantized_kv_chef is set, the Chef's recipes keep a full precision KV
+        self.use_quantized_kv = False
+        self.quantized_kv_backend = "HQQ"
+        self.quantized_kv_nbits = 8
+        self.quantized_kv_chef = False
+        self.quantized_kv_min_tokens = 400
+        supported_nbits = {"HQQ": (1, 2, 3, 4, 8), "quanto": (2, 4)}
+        if self.quantized_kv_nbits not in supported_nbits.get(self.quantized_kv_backend, ()):
+            raise ValueError(
+                f"Quantized KV: backend {self.quantized_kv_backend!r} doesn't support {self.quantized_kv_nbits} bits "
+                f"(supported: {supported_nbits})"
+            )
+
+        # Left padding so batched prompts all end on the same position
+        for tokenizer in (self.chef_tokenizer, self.waiter_tokenizer):
+            if tokenizer is None:
+                continue
+            tokenizer.padding_side = "left"
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+
+        # Classification label sets, picked with one forward pass over their first tokens
+        self._router_labels = ("RECIPE", "CHAT", "SAFETY", "CONSTANTS", "INSTRUCT", "ELSE")
+        self._food_labels = ("SAFETY", "CONSTANTS", "INSTRUCT", "ELSE")
+        # (no logits from the LLM servers or vLLM engines, classify() generates the label there)
+        self._label_ids = {
+            labels: self._first_token_ids(self.waiter_tokenizer, labels) if self.waiter_tokenizer else None
+            for labels in (self._router_labels, self._food_labels)
+        }
+
+        # Memoized classification results (LRU), see classify()
+        self.label_cache_size = 4096
+        self._label_cache = OrderedDict()
+        self._label_cache_lock = threading.Lock()
+
+        # Optional micro-batcher (see batcher.py), set by the API server
+        self.batcher = None
+
+        # Pinned host staging buffer for prompt uploads (one per generating thread,
+        # rows: input_ids / attention_mask), prompts longer than this use .to("cuda")
+        self.pinned_max_tokens = 2048
+        self._pinned_local = threading.local()
+
+        # Token streaming: per-thread output queue set by router_stream()
+        self._stream_local = threading.local()
+        self._stream_executor = ThreadPoolExecutor(max_workers=1)
+
+        # Keyword fast path for the router (skips the Waiter classification)
+        self._intent_rx = {
+            "CHAT": re.compile(r"^(hi|hello|hey|how are you|who are you|thanks?|thank you|bye)\b", re.I),
+            # Recipe requests only, "how do I make the sauce thicker?" is a follow-up
+            "RECIPE": re.compile(
+                r"\b(?:(?:give me|find me|show me|i want|i need|suggest) (?:a |another |some |a new )?recipes?"
+                r"|recipe for|cook (?:me|something|some|a|an)"
+                r"|(?:i want to|i'd like to|let'?s|can you|help me) (?:make|cook|eat)"
+                r"|what (?:should|can|do) i (?:make|cook|eat)|i'?m (?:hungry|starving)"
+                r"|what'?s for (?:dinner|lunch|breakfast))\b",
+                re.I
+            ),
+            "FOOD_RELATED": re.compile(r"\b(convert|substitute|safe|store|temperature|calories|grams|ml|oz)\b", re.I)
+        }
+        # Accepting a suggested dish, a recipe request only when no recipe is on
+        # the go ("Sure, what's next?" is about the current one)
+        self._confirm_rx = re.compile(r"^\W*(yes|yeah|yep|sure|ok(?:ay)?|sounds good|let'?s do it)\W*$", re.I)
+        # Same for the food sub-intents (skips the Waiter sub-classification)
+        self._food_rx = {
+            "SAFETY": re.compile(r"\b(safe|safety|raw chicken|undercooked|expired|spoiled|store|storage|fridge|allerg\w*)\b", re.I),
+            "CONSTANTS": re.compile(r"\b(convert|grams?|cups?|ml|oz|ounces?|tbsp|tsp|substitute|replace|instead of|calories|protein)\b", re.I),
+            "INSTRUCT": re.compile(r"\b(step \d+|next step|first step|how do i)\b", re.I)
+        }
+
+        # Semantic cache for chat replies: exact hits, or a cosine similarity
+        # above the threshold, for the same recent conversation context
+        self.chat_cache_size = 256
+        self.chat_cache_threshold = 0.95
+        self._chat_cache = OrderedDict()
+        self._chat_cache_lock = threading.Lock()
+
+        # Recipe sections for the Python plating
+        # (headers may be bold, the Chef was fine-tuned on "**Instructions:**")
+        self._ingredients_rx = re.compile(
+            r"ingredients[\s:*]*\n(.*?)\n[\s*]*(?:steps|instructions|directions|method)[\s:*]*\n", re.I | re.S
         )
-        FastLanguageModel.for_inference(self.chef_model)
-
-        # Loading waiter model
-        print("🧑‍🍳 Loading Waiter model...")
-        self.waiter_model, self.waiter_tokenizer = FastLanguageModel.from_pretrained(
-            model_name=self.waiter_name,
-            max_seq_length=2048,
-            dtype=None,
-            load_in_4bit=True,
+        self._steps_block_rx = re.compile(r"^[\s*]*(?:steps|instructions|directions|method)[\s:*]*\n(.*)", re.I | re.S | re.M)
+        self._step_split_rx = re.compile(r"\n+|(?<=[.!])\s+(?=\d+[.)]\s)")
+        self._list_marker_rx = re.compile(r"^\s*(?:[-*•]|\d+[.)]|step \d+\s*[:.)-]?)\s*", re.I)
+
+        # Chef recipe generation ends as soon as it starts a second recipe
+        self.recipe_stop_strings = ["Option 2", "Recipe 2", "\n###", "\n\n\n"]
+        # or once it's this long (the recipe gets truncated there anyway)
+        self.recipe_max_chars = 2500
+
+        # handle_recipe overlap: RAG lookup next to the Waiter cleaning step,
+        # plating prefill next to the Chef recipe decode
+        self._rag_executor = ThreadPoolExecutor(max_workers=2)
+        self._steps_rx = re.compile(r"^[\s*]*(steps|instructions|directions|method)\b", re.I | re.M)
+
+        # Dish name cleanup of the Chef ideation (drops labels, fillers, quotes, end punctuation)
+        self._dish_name_rx = re.compile(
+            r"^(?:(?:Dish(?: name)?|Recipe|Title)\s*[:-]\s*)?"
+            r"(?:(?:I (?:would )?suggest|I recommend|Here(?:'s| is)(?: an?| the)?|How about|Try|Let's make)\s+)?"
+            r"[\"'“]?(.+?)[\"'”]?[.!?]*\s*$",
+            re.I
         )
-        FastLanguageModel.for_inference(self.waiter_model)
+
+        # Chat history window: last 6 lines, at most this many Waiter tokens
+        self.history_max_tokens = 400
 
         # Multi-user session storage
         self.sessions = {}
+        self._sessions_lock = threading.Lock()
+
+        # First generate() calls pay kernel JIT/autotuning, done before user traffic
+        self.warmup = True
+        if self.warmup and self._local_models:
+            self._warmup()
 
         print("✅ ChefAI is ready to serve!")
 
+    def _warmup(self):
+        """
+        Runs a 1-token generation on both models, each on its own thread and
+        CUDA stream so their warmups overlap (one after the other when they
+        share a backbone).
+        """
+        print("🔥 Warming up models...")
+
+        def run(model, tokenizer):
+            stream = torch.cuda.Stream()
+            inputs = tokenizer(["Hello"], return_tensors="pt").to("cuda")
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream), torch.inference_mode():
+                model.generate(**inputs, max_new_tokens=1, pad_token_id=tokenizer.eos_token_id)
+
+        jobs = [(self.chef_model, self.chef_tokenizer), (self.waiter_model, self.waiter_tokenizer)]
+        if self.waiter_adapter:
+            for job in jobs:
+                run(*job)
+        else:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                for future in [pool.submit(run, *job) for job in jobs]:
+                    future.result()
+
+        # The compiled Waiter traces/captures on the first prompt of each length
+        # bucket, dummy prompts take that hit here
+        if self.compile_waiter:
+            token_id = self.waiter_tokenizer("Hello", add_special_tokens=False).input_ids[0]
+            for bucket in self.compile_warmup_buckets:
+                input_ids = torch.full((1, bucket), token_id, dtype=torch.long, device="cuda")
+                with torch.inference_mode():
+                    self.waiter_model.generate(
+                        input_ids=input_ids,
+                        attention_mask=torch.ones_like(input_ids),
+                        max_new_tokens=8,
+                        pad_token_id=self.waiter_tokenizer.eos_token_id
+                    )
+        torch.cuda.synchronize()
+
+    def _load_model(self, model_name, awq_path=None):
+        """
+        Loads a model + tokenizer for inference.
+        AWQ checkpoint if one is given, otherwise Unsloth 4-bit (bitsandbytes)
+        or 16-bit weights, depending on load_in_4bit.
+        """
+        if awq_path:
+            from awq import AutoAWQForCausalLM
+            from transformers import AutoTokenizer
+
+            model = AutoAWQForCausalLM.from_quantized(awq_path, fuse_layers=True, use_exllama_v2=True)
+            tokenizer = AutoTokenizer.from_pretrained(awq_path)
+            return model, tokenizer
+
+        # bf16 compute + Flash-Attention 2 where the GPU/packages support it
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else None
+        attn_kwargs = {}
+        if importlib.util.find_spec("flash_attn") is not None:
+            attn_kwargs["attn_implementation"] = "flash_attention_2"
+
+        model, tokenizer = FastLanguageModel.from_pretrained(
+            model_name=model_name,
+            max_seq_length=2048,
+            dtype=dtype,
+            load_in_4bit=self.load_in_4bit,
+            **attn_kwargs
+        )
+        FastLanguageModel.for_inference(model)
+        return model, tokenizer
+
+    def _model_lock(self, model):
+        """
+        Lock of the weights behind model (see _model_locks), taken around every
+        GPU call made on them.
+        """
+        return self._model_locks.get(id(model)) or contextlib.nullcontext()
+
     def _get_session(self, session_id):
         """
         Retrieves the specific memory for a user. 
         If it doesn't exist, creates a new empty memory slot.
         """
-        if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                "current_dish": None,
-                "current_recipe_text": None,
-                "chat_history": []
-            }
-        return self.sessions[session_id]
+        session = self.sessions.get(session_id)
+        if session is None:
+            with self._sessions_lock:
+                session = self.sessions.setdefault(session_id, {
+                    "current_dish": None,
+                    "current_recipe_text": None,
+                    "chat_history": deque(),
+                    "chat_history_ids": deque(),
+                    "chat_history_tokens": deque(),
+                    "chat_history_str": "",
+                    "lock": threading.RLock()
+                })
+        return session
+
+    def _build_prefix_cache(self, model, tokenizer, prefix):
+        """
+        Runs a static prompt preamble through the model once and keeps its KV cache.
+        Also keeps the preamble token ids, so later calls only tokenize their tail.
+        """
+        prefix_ids = tokenizer([prefix], return_tensors="pt").input_ids.to("cuda")
+
+        fingerprint = self._model_fingerprint(model)
+        cache = self._load_prefix_kv(prefix_ids, fingerprint)
+        if cache is None:
+            cache = DynamicCache()
+            with torch.inference_mode():
+                model(input_ids=prefix_ids, past_key_values=cache, use_cache=True)
+            self._save_prefix_kv(prefix_ids, fingerprint, cache)
+
+        return {
+            "text": prefix,
+            "ids": prefix_ids,
+            "cache": cache,
+            "tail_trim": self._calibrate_tail(tokenizer, prefix, prefix_ids)
+        }
+
+    def _model_fingerprint(self, model):
+        """
+        Identifies the weights/numerics a stored KV cache was computed with:
+        the checkpoint and adapter files (sizes + mtimes, a retrain saved to the
+        same path is a new model), load settings, active adapter and versions.
+        """
+        if model is self.waiter_model and self.waiter_adapter is None:
+            sources = [self.waiter_name, self.waiter_awq_path]
+        else:
+            sources = [self.chef_path, self.chef_awq_path, self.waiter_adapter]
+
+        adapter = getattr(model, "adapter_name", None) or getattr(model, "active_adapter", None)
+        return "|".join([
+            str(model.config._name_or_path),
+            str(model.dtype),
+            f"4bit={self.load_in_4bit}",
+            f"adapter={adapter}",
+            torch.__version__,
+            transformers.__version__
+        ] + [self._files_signature(path) for path in sources if path])
+
+    @staticmethod
+    def _files_signature(path):
+        """
+        Size and mtime of every file of a local checkpoint/adapter directory
+        (hub model names are kept as they are).
+        """
+        if not os.path.exists(path):
+            return str(path)
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        return ";".join(
+            f"{os.path.relpath(f, path)}:{os.path.getsize(f)}:{int(os.path.getmtime(f))}" for f in files
+        )
+
+    def _prefix_kv_path(self, prefix_ids, fingerprint):
+        digest = hashlib.blake2b(prefix_ids.cpu().numpy().tobytes(), digest_size=16)
+        digest.update(fingerprint.encode())
+        return os.path.join(self._kv_store_dir, f"{digest.hexdigest()}.pt")
+
+    def _load_prefix_kv(self, prefix_ids, fingerprint):
+        """
+        Loads a persisted preamble KV cache, or None if missing/stale.
+        """
+        path = self._prefix_kv_path(prefix_ids, fingerprint)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            data = torch.load(path, mmap=True, map_location="cpu")
+        except Exception as e:
+            print(f"⚠️ Could not read KV cache file {path}: {e}")
+            return None
+
+        if data.get("fingerprint") != fingerprint:
+            return None
+
+        legacy = tuple((k.to("cuda"), v.to("cuda")) for k, v in zip(data["k"], data["v"]))
+        return DynamicCache.from_legacy_cache(legacy)
+
+    def _save_prefix_kv(self, prefix_ids, fingerprint, cache):
+        """
+        Persists a preamble KV cache next to the fingerprint of its model.
+        """
+        legacy = cache.to_legacy_cache()
+        os.makedirs(self._kv_store_dir, exist_ok=True)
+        torch.save(
+            {
+                "fingerprint": fingerprint,
+                "k": [k.cpu() for k, _ in legacy],
+                "v": [v.cpu() for _, v in legacy]
+            },
+            self._prefix_kv_path(prefix_ids, fingerprint)
+        )
+
+    @staticmethod
+    def _calibrate_tail(tokenizer, prefix, prefix_ids, probe="\n\nUser"):
+        """
+        Checks that [prefix ids + separately tokenized tail ids] matches tokenizing
+        the whole prompt. SentencePiece tokenizers add a dummy leading token to a
+        standalone tail, returns how many leading tail tokens to drop (None if
+        the two tokenizations can't be lined up).
+        """
+        joined = tokenizer(prefix + probe).input_ids
+        prefix_len = prefix_ids.shape[-1]
+        if joined[:prefix_len] != prefix_ids[0].tolist():
+            return None
+
+        expected = joined[prefix_len:]
+        alone = tokenizer(probe, add_special_tokens=False).input_ids
+        trim = len(alone) - len(expected)
+        if trim < 0 or alone[trim:] != expected:
+            return None
+        return trim
+
+    def _prefix_entry(self, prefix):
+        """
+        prefix is either the name of a cached Waiter preamble or an entry built
+        on the fly by _extend_prefix().
+        """
+        if isinstance(prefix, dict):
+            return prefix
+        return self.prefix_cache.get(prefix) if prefix else None
+
+    def _extend_prefix(self, model, tokenizer, prefix, text):
+        """
+        Extends a cached preamble with more known text (e.g. the part of a recipe
+        already generated) by prefilling only that text on a copy of its KV.
+        Returns a new prefix entry, or None if it can't be lined up.
+        """
+        base = self._prefix_entry(prefix)
+        if base is None or base["tail_trim"] is None or not text:
+            return None
+
+        tail_ids = tokenizer(text, return_tensors="pt", add_special_tokens=False).input_ids
+        tail_ids = self._upload(tail_ids[:, base["tail_trim"]:])[0]
+        if tail_ids.shape[-1] == 0:
+            return None
+
+        ids = torch.cat([base["ids"], tail_ids], dim=1)
+        cache = copy.deepcopy(base["cache"])
+        with self._model_lock(model), torch.inference_mode():
+            model(input_ids=tail_ids, attention_mask=torch.ones_like(ids), past_key_values=cache, use_cache=True)
+
+        full_text = base["text"] + text
+        return {
+            "text": full_text,
+            "ids": ids,
+            "cache": cache,
+            "tail_trim": self._calibrate_tail(tokenizer, full_text, ids)
+        }
+
+    def _prepare_inputs(self, tokenizer, prompt, prefix):
+        """
+        Tokenizes a single prompt. When it starts with a cached preamble, only the
+        tail goes through the tokenizer and the preamble KV is reused.
+        Returns (inputs, cache_kwargs).
+        """
+        entry = self._prefix_entry(prefix)
+
+        if isinstance(prompt, SegmentedPrompt):
+            head = prompt.parts[0]
+            if entry is not None and entry["tail_trim"] is not None and head.startswith(entry["text"]):
+                ids = []
+                for part in [head[len(entry["text"]):]] + list(prompt.parts[1:]):
+                    if isinstance(part, str):
+                        ids += tokenizer(part, add_special_tokens=False).input_ids[entry["tail_trim"]:] if part else []
+                    else:
+                        ids += part
+                if ids:
+                    tail_ids = self._upload(torch.tensor([ids], dtype=torch.long))[0]
+                    input_ids = torch.cat([entry["ids"], tail_ids], dim=1)
+                    inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+                    return inputs, {"past_key_values": copy.deepcopy(entry["cache"])}
+            prompt = prompt.text
+
+        if entry is not None and entry["tail_trim"] is not None and prompt.startswith(entry["text"]):
+            tail = prompt[len(entry["text"]):]
+            tail_ids = tokenizer(tail, return_tensors="pt", add_special_tokens=False).input_ids
+            tail_ids = self._upload(tail_ids[:, entry["tail_trim"]:])[0]
+            if tail_ids.shape[-1] > 0:
+                input_ids = torch.cat([entry["ids"], tail_ids], dim=1)
+                inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+                # Deep copy, generate() extends the cache in place
+                return inputs, {"past_key_values": copy.deepcopy(entry["cache"])}
+
+        inputs = tokenizer([prompt], return_tensors="pt")
+        input_ids, attention_mask = self._upload(inputs['input_ids'], inputs['attention_mask'])
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        return inputs, self._prefix_kwargs(prefix, input_ids)
+
+    def _upload(self, *tensors):
+        """
+        Copies CPU tensors to the GPU through a pinned staging buffer with
+        non_blocking copies, so the upload is queued instead of blocking on a
+        pageable memcpy. The copies go on a side stream of this thread, so they
+        don't queue behind the other model's kernels on the default stream.
+        Falls back to a plain .to("cuda") when the tensors don't fit the buffer.
+        """
+        if not torch.cuda.is_available():
+            return [t.to("cuda") for t in tensors]
+
+        buf = getattr(self._pinned_local, "buf", None)
+        if buf is None:
+            buf = torch.empty((2, self.pinned_max_tokens), dtype=torch.long, pin_memory=True)
+            self._pinned_local.buf = buf
+            self._pinned_local.stream = torch.cuda.Stream()
+            self._pinned_local.copied = None
+        copy_stream = self._pinned_local.stream
+
+        if len(tensors) > buf.shape[0] or any(t.numel() > buf.shape[1] for t in tensors):
+            return [t.to("cuda") for t in tensors]
+
+        # The previous upload's copies may still be reading the buffer (nothing
+        # syncs the host between back-to-back _extend_prefix calls), the host
+        # waits for them before overwriting it
+        if self._pinned_local.copied is not None:
+            self._pinned_local.copied.synchronize()
+
+        out = []
+        with torch.cuda.stream(copy_stream):
+            for row, t in zip(buf, tensors):
+                staged = row[:t.numel()].view(t.shape)
+                staged.copy_(t)
+                out.append(staged.to("cuda", non_blocking=True))
+            self._pinned_local.copied = copy_stream.record_event()
+
+        # The compute stream only waits for the copies (the host doesn't), and
+        # the allocator mustn't reuse their memory before it's done with them
+        compute_stream = torch.cuda.current_stream()
+        compute_stream.wait_stream(copy_stream)
+        for t in out:
+            t.record_stream(compute_stream)
+        return out
+
+    def _prepare_batch_inputs(self, tokenizer, prompts, prefix):
+        """
+        Batched version of _prepare_inputs (segmented prompts go in as text). With a cached preamble shared by all
+        prompts, the tails are left padded on their own and put after the
+        preamble ([preamble][pad][tail]), the masked gap keeps the positions
+        of every row contiguous so one expanded copy of the preamble KV fits
+        all of them. Otherwise plain left padding and full prefill.
+        Returns (inputs, cache_kwargs).
+        """
+        prompts = [p.text if isinstance(p, SegmentedPrompt) else p for p in prompts]
+        entry = self._prefix_entry(prefix)
+
+        if (entry is not None and entry["tail_trim"] is not None
+                and hasattr(entry["cache"], "batch_repeat_interleave")
+                and all(p.startswith(entry["text"]) for p in prompts)):
+            tails = [
+                tokenizer(p[len(entry["text"]):], add_special_tokens=False).input_ids[entry["tail_trim"]:]
+                for p in prompts
+            ]
+            if all(tails):
+                width = max(len(t) for t in tails)
+                tail_ids = torch.full((len(tails), width), tokenizer.pad_token_id, dtype=torch.long)
+                tail_mask = torch.zeros((len(tails), width), dtype=torch.long)
+                for row, tail in enumerate(tails):
+                    tail_ids[row, width - len(tail):] = torch.tensor(tail, dtype=torch.long)
+                    tail_mask[row, width - len(tail):] = 1
+
+                tail_ids, tail_mask = self._upload(tail_ids, tail_mask)
+                prefix_ids = entry["ids"].expand(len(tails), -1)
+                inputs = {
+                    "input_ids": torch.cat([prefix_ids, tail_ids], dim=1),
+                    "attention_mask": torch.cat([torch.ones_like(prefix_ids), tail_mask], dim=1)
+                }
+                cache = copy.deepcopy(entry["cache"])
+                cache.batch_repeat_interleave(len(tails))
+                return inputs, {"past_key_values": cache}
+
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+        input_ids, attention_mask = self._upload(inputs['input_ids'], inputs['attention_mask'])
+        return {"input_ids": input_ids, "attention_mask": attention_mask}, {}
+
+    def _prefix_kwargs(self, prefix, input_ids):
+        """
+        Returns a private copy of the cached preamble KV if the tokenized prompt
+        really starts with that preamble, otherwise an empty dict (full prefill).
+        """
+        entry = self._prefix_entry(prefix)
+        if entry is None:
+            return {}
+
+        prefix_len = entry["ids"].shape[-1]
+        if input_ids.shape[-1] <= prefix_len or not torch.equal(input_ids[:, :prefix_len], entry["ids"]):
+            return {}
 
-    def run_inference(self, model, tokenizer, prompt, max_tokens=512, repeat_penalty=1.1, temperature=0.6):
+        # Deep copy, generate() extends the cache in place
+        return {"past_key_values": copy.deepcopy(entry["cache"])}
+
+    def run_inference(self, model, tokenizer, prompt, max_tokens=512, repeat_penalty=1.1, temperature=0.6, stop_strings=None, prefix=None, stream=False, max_chars=None):
         """ 
         Run inference on the given model with the provided prompt. 
+        Optional stop_strings end the generation as soon as one is produced,
+        max_chars once the output is that long (local models only).
+        If prefix names a cached preamble, only the prompt tail is prefilled.
+        stream=True marks a user-facing answer: under router_stream() its text
+        is forwarded chunk by chunk while it decodes.
         """
-        inputs = tokenizer([prompt], return_tensors="pt").to("cuda")
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=max_tokens,
-            pad_token_id=tokenizer.eos_token_id,
-            repetition_penalty=repeat_penalty,
-            use_cache=True,
-            temperature = temperature,
-            do_sample = True
-        )
-        new_tokens = outputs[0][inputs['input_ids'].shape[-1]:]
-        return tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
+        gen_kwargs = {
+            "max_tokens": max_tokens,
+            "repeat_penalty": repeat_penalty,
+            "temperature": temperature,
+            "stop_strings": stop_strings,
+            "prefix": prefix
+        }
+
+        if isinstance(model, (RemoteModel, EngineModel)):
+            sink = getattr(self._stream_local, "queue", None) if stream else None
+            if sink is not None:
+                self._stream_local.streamed = True
+                return model.complete(prompt, on_chunk=sink.put, **gen_kwargs)
+            return model.complete(prompt, **gen_kwargs)
+
+        if max_chars is not None:
+            gen_kwargs["max_chars"] = max_chars
+
+        sink = getattr(self._stream_local, "queue", None) if stream else None
+        if sink is not None:
+            return self._stream_inference(model, tokenizer, prompt, sink, gen_kwargs)
+
+        # Concurrent sessions share generate() calls through the batcher
+        if self.batcher is not None:
+            return self.batcher.submit(model, tokenizer, prompt, **gen_kwargs).result()
+
+        return self._generate(model, tokenizer, [prompt], **gen_kwargs)[0]
+
+    def _stream_inference(self, model, tokenizer, prompt, sink, gen_kwargs):
+        """
+        Generates on another thread and forwards decoded chunks to sink.
+        Returns the full text, same as run_inference.
+        """
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        if self.batcher is not None:
+            future = self.batcher.submit(model, tokenizer, prompt, streamer=streamer, **gen_kwargs)
+        else:
+            future = self._stream_executor.submit(
+                lambda: self._generate(model, tokenizer, [prompt], streamer=streamer, **gen_kwargs)[0]
+            )
+
+        for chunk in streamer:
+            if chunk:
+                sink.put(chunk)
+        self._stream_local.streamed = True
+
+        return future.result()
+
+    def router_stream(self, user_input, session_id="default"):
+        """
+        Same as router() but yields the answer in chunks as it's generated.
+        Intermediate pipeline steps (classification, ideation...) run as usual.
+        """
+        sink = queue.Queue()
+        done = object()
+
+        def worker():
+            self._stream_local.queue = sink
+            self._stream_local.streamed = False
+            try:
+                output = self.router(user_input, session_id)
+                # Answers that didn't come from a streamed generation
+                if not self._stream_local.streamed:
+                    sink.put(output)
+                sink.put(done)
+            except Exception as e:
+                sink.put(e)
+            finally:
+                self._stream_local.queue = None
+
+        threading.Thread(target=worker, daemon=True).start()
+
+        while True:
+            item = sink.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _generate(self, model, tokenizer, prompts, max_tokens=512, repeat_penalty=1.1, temperature=0.6, stop_strings=None, prefix=None, streamer=None, max_chars=None):
+        """
+        Runs one generate() call over a list of prompts (left padded).
+        max_tokens can also be a list with a budget per prompt.
+        Returns the decoded new text for each prompt.
+        """
+        limits = max_tokens if isinstance(max_tokens, list) else [max_tokens] * len(prompts)
+        max_tokens = max(limits)
+
+        if len(prompts) == 1:
+            inputs, cache_kwargs = self._prepare_inputs(tokenizer, prompts[0], prefix)
+            if self.reuse_turn_kv and model is self.waiter_model and not self.compile_waiter:
+                cache_kwargs = self._reuse_turn_kv(inputs['input_ids'], cache_kwargs)
+        else:
+            inputs, cache_kwargs = self._prepare_batch_inputs(tokenizer, prompts, prefix)
+
+        if self.compile_waiter and model is self.waiter_model and not cache_kwargs:
+            inputs = self._pad_to_bucket(inputs, tokenizer.pad_token_id)
+
+        stop_kwargs = {}
+        if stop_strings:
+            stop_kwargs = {"stop_strings": stop_strings, "tokenizer": tokenizer}
+
+        # Quantized KV cache for long generations. A reused preamble KV is full
+        # precision, long calls drop it and prefill the whole prompt into the
+        # quantized cache instead (a prefill traded for a KV ~2-4x smaller)
+        quantize_kv = self.use_quantized_kv and (self.quantized_kv_chef or model is not self.chef_model)
+        if quantize_kv and max_tokens >= self.quantized_kv_min_tokens:
+            cache_config = {"backend": self.quantized_kv_backend, "nbits": self.quantized_kv_nbits}
+            if self.quantized_kv_backend == "HQQ":
+                cache_config.update({"axis_key": 0, "axis_value": 0})
+            else:
+                cache_config["compute_dtype"] = model.dtype
+            cache_kwargs = {"cache_implementation": "quantized", "cache_config": cache_config}
+            print(f"🗜️ [DEBUG] Quantized KV ({self.quantized_kv_backend}, {self.quantized_kv_nbits}-bit) for up to {max_tokens} new tokens")
+
+        # Waiter drafts, Chef verifies (assisted generation is batch size 1 only).
+        # The drafting starts from a fresh cache, so the Chef preamble KV is
+        # dropped: the preamble gets prefilled again, for the faster decode.
+        if (self.speculative_chef and model is self.chef_model and self.waiter_adapter is None
+                and len(prompts) == 1 and "cache_implementation" not in cache_kwargs):
+            cache_kwargs = {}
+            stop_kwargs = {
+                **stop_kwargs,
+                "assistant_model": self.waiter_model,
+                "tokenizer": tokenizer,
+                "assistant_tokenizer": self.waiter_tokenizer
+            }
+
+        if streamer is not None:
+            cache_kwargs["streamer"] = streamer
+
+        if max_chars is not None:
+            criteria = CharBudgetCriteria(tokenizer, inputs['input_ids'].shape[-1], max_chars)
+            stop_kwargs = {**stop_kwargs, "stopping_criteria": transformers.StoppingCriteriaList([criteria])}
+
+        # Near-zero temperatures decode greedily (no sampling kernels). The
+        # checkpoint's sampling defaults are cleared, greedy runs ignore them anyway.
+        sample_kwargs = {"do_sample": False, "temperature": None, "top_p": None, "top_k": None}
+        if temperature > 0.15:
+            sample_kwargs = {"do_sample": True, "temperature": temperature}
+
+        # An assisting Waiter runs inside this call too, its lock is held as well
+        assistant = stop_kwargs.get("assistant_model")
+        try:
+            with self._model_lock(model), self._model_lock(assistant), torch.inference_mode():
+                outputs = model.generate(
+                    **inputs,
+                    max_new_tokens=max_tokens,
+                    pad_token_id=tokenizer.eos_token_id,
+                    repetition_penalty=repeat_penalty,
+                    use_cache=True,
+                    **sample_kwargs,
+                    **stop_kwargs,
+                    **cache_kwargs
+                )
+        except Exception:
+            # Unblocking a streaming consumer before bailing out
+            if streamer is not None:
+                streamer.end()
+            raise
+        # generate() extended our DynamicCache in place, keeping it for later turns
+        if self.reuse_turn_kv and model is self.waiter_model and len(prompts) == 1:
+            cache = cache_kwargs.get("past_key_values")
+            if isinstance(cache, DynamicCache):
+                self._store_turn_kv(inputs['input_ids'], cache)
+
+        prompt_len = inputs['input_ids'].shape[-1]
+        return [
+            tokenizer.decode(row[prompt_len:prompt_len + limit], skip_special_tokens=True).strip()
+            for row, limit in zip(outputs, limits)
+        ]
     
+    def _reuse_turn_kv(self, input_ids, cache_kwargs):
+        """
+        Looks for a kept Waiter KV whose prompt shares a longer token prefix
+        with this one than the preamble cache does (e.g. the previous turn of
+        the same chat: preamble + older history). Takes it over, cropped to the
+        shared prefix, so only the new tokens get prefilled.
+        """
+        cached_len = 0
+        if "past_key_values" in cache_kwargs:
+            cached_len = cache_kwargs["past_key_values"].get_seq_length()
+
+        best_key, best_len = None, cached_len
+        with self._turn_kv_lock:
+            for key, (ids, _) in self._turn_kv.items():
+                n = min(ids.shape[-1], input_ids.shape[-1] - 1)
+                if n <= best_len:
+                    continue
+                same = (ids[0, :n] == input_ids[0, :n]).int()
+                shared = int(same.cumprod(0).sum())
+                if shared > best_len:
+                    best_key, best_len = key, shared
+            if best_key is None:
+                return cache_kwargs
+            _, cache = self._turn_kv.pop(best_key)
+
+        cache.crop(best_len)
+        return {**cache_kwargs, "past_key_values": cache}
+
+    def _store_turn_kv(self, input_ids, cache):
+        with self._turn_kv_lock:
+            self._turn_kv[id(cache)] = (input_ids, cache)
+            while len(self._turn_kv) > self.turn_kv_entries:
+                self._turn_kv.popitem(last=False)
+
+    def _pad_to_bucket(self, inputs, pad_token_id):
+        """
+        Left pads input_ids/attention_mask up to the next length bucket, so the
+        compiled Waiter sees a handful of shapes instead of one per prompt.
+        """
+        length = inputs['input_ids'].shape[-1]
+        bucket = next((b for b in self.compile_buckets if b >= length), length)
+        if bucket == length:
+            return inputs
+
+        pad = bucket - length
+        return {
+            "input_ids": torch.nn.functional.pad(inputs['input_ids'], (pad, 0), value=pad_token_id),
+            "attention_mask": torch.nn.functional.pad(inputs['attention_mask'], (pad, 0), value=0)
+        }
+
     def _update_history(self, session_id, user_text, bot_text):
         """
         Internal helper to save chat to SPECIFIC USER memory.
+        The joined history string and the Waiter token ids of every line are
+        kept up to date incrementally, the sliding window drops the oldest
+        lines past 6 lines or history_max_tokens tokens.
         """
         session = self._get_session(session_id)
-        session['chat_history'].append(f"User: {user_text}")
-        session['chat_history'].append(f"Chef: {bot_text}")
+        history, line_ids, line_tokens = session['chat_history'], session['chat_history_ids'], session['chat_history_tokens']
+
+        for line in (f"User: {user_text}", f"Chef: {bot_text}"):
+            ids = self._line_ids(line)
+            history.append(line)
+            line_ids.append(ids)
+            # (no tokenizer for remote models, ~4 characters per token)
+            line_tokens.append(len(ids) if ids is not None else len(line) // 4)
+            session['chat_history_str'] = f"{session['chat_history_str']}\n{line}" if len(history) > 1 else line
 
         # Enforcing sliding window
-        if len(session['chat_history']) > 6:
-            session['chat_history'] = session['chat_history'][-6:]
+        while len(history) > 2 and (len(history) > 6 or sum(line_tokens) > self.history_max_tokens):
+            dropped = history.popleft()
+            line_ids.popleft()
+            line_tokens.popleft()
+            session['chat_history_str'] = session['chat_history_str'][len(dropped) + 1:]
+
+    def _history_ids(self, session, prefix):
+        """
+        The session's history token ids as one list, for a prompt starting with
+        the given preamble. None when that preamble trims tails differently from
+        the chat one the ids were made with, or without ids (remote models): the
+        history then goes in as text.
+        """
+        chat, entry = self.prefix_cache.get("chat"), self.prefix_cache.get(prefix)
+        if entry is not None and (chat is None or entry["tail_trim"] != chat["tail_trim"]):
+            return None
+        if any(ids is None for ids in session['chat_history_ids']):
+            return None
+        return [token for ids in session['chat_history_ids'] for token in ids]
+
+    def _line_ids(self, line):
+        """
+        Waiter token ids of a history line as it appears in a prompt, i.e.
+        after a newline (same leading-token trim as the prompt tails).
+        None for remote models (no local tokenizer).
+        """
+        if self.waiter_tokenizer is None:
+            return None
+        entry = self.prefix_cache.get("chat")
+        trim = entry["tail_trim"] if entry and entry["tail_trim"] is not None else 0
+        return self.waiter_tokenizer("\n" + line, add_special_tokens=False).input_ids[trim:]
     
     def router(self, user_input, session_id="default"):
         """
         Route the user input to the appropriate model (Brain or Mouth).
         Now accepts session_id to track context.
-        """
-        
-        # Classification prompt
-        prompt = textwrap.dedent(f"""<|user|>
-        Task: Classify User Input into ONE category: RECIPE, CHAT, or FOOD_RELATED.
-
-        DEFINITIONS:
-        1. RECIPE: User explicitly asks for a NEW dish, a different dish, or provides NEW ingredients to start over. (e.g. "Cook X", "No, I want Salmon", "I have beef instead").
-        2. CHAT: Greetings, compliments, or general conversation. (e.g. "Hi", "Thanks", "Good evening").
-        3. FOOD_RELATED: Questions about the CURRENT recipe. Includes: Steps, Safety, Scaling portions, or asking for measurements. (e.g. "How much?", "For 3 people?", "Next step", "Is it safe?").
 
-        User Input: "{user_input}"
-        
-        OUTPUT ONLY THE CATEGORY NAME.<|end|>
-        <|assistant|>""").strip()
+        Turns of the same session run one at a time (they read and write the
+        session state), turns of different sessions still run concurrently.
+        """
+        session = self._get_session(session_id)
+        with session["lock"]:
+            return self._route(user_input, session_id)
 
-        intent = self.run_inference(
-            model=self.waiter_model,
-            tokenizer=self.waiter_tokenizer,
-            prompt=prompt,
-            max_tokens=10,
-            temperature=0.1
-        ).upper()
+    def _route(self, user_input, session_id):
+        """
+        A single Waiter forward pass picks the intent, food sub-intents
+        included, so FOOD_RELATED turns skip the separate sub-classification.
+        """
+        session = self._get_session(session_id)
 
-        intent = intent.replace("CATEGORY:", "").strip().split()[0].replace(".", "")
+        # Keyword fast path: only trust it when exactly one intent matches
+        matches = [intent for intent, rx in self._intent_rx.items() if rx.search(user_input)]
+        if not matches and not session['current_recipe_text'] and self._confirm_rx.search(user_input):
+            matches = ["RECIPE"]
+        if len(matches) == 1:
+            intent = matches[0]
+
+            # DEBUG START
+            print(f"🔀 [DEBUG][{session_id}] Router Intent (keyword): {intent}")
+            # DEBUG END
+
+            if intent == "RECIPE":
+                return self.handle_recipe(user_input, session_id)
+            elif intent == "FOOD_RELATED":
+                return self.handle_food_related(user_input, session_id)
+            else:
+                return self.handle_chat(user_input, session_id)
+
+        history_str = session['chat_history_str']
+
+        # Fused classification prompt
+        prompt = ROUTER_TEMPLATE.format(history_str=history_str, user_input=user_input)
+
+        # With history, it goes in as its stored token ids (as in handle_chat)
+        history_ids = self._history_ids(session, "router")
+        if history_ids:
+            head, tail = self._history_segments(ROUTER_TEMPLATE, user_input=user_input)
+            prompt = SegmentedPrompt([head, history_ids, tail], prompt)
+
+        # No speculative chat reply is batched with this classification: it's one
+        # forward over the tokens after the cached router preamble, no decoding.
+        # A chat branch run alongside could only hide that forward on CHAT turns,
+        # and on every other turn would spend up to 100 sampled decode steps on
+        # the same (locked) Waiter weights, ahead of the handler that answers.
+        # The intent depends on the input and the latest exchange
+        cache_key = (user_input.strip().lower(), '\n'.join(list(session['chat_history'])[-2:]))
+        intent = self.classify(
+            self.waiter_model, self.waiter_tokenizer, prompt, self._router_labels,
+            prefix="router", cache_key=cache_key
+        )
 
         # DEBUG START
         print(f"🔀 [DEBUG][{session_id}] Router Intent: {intent}")
         # DEBUG END
 
-        if "RECIPE" in intent:
+        if intent == "RECIPE":
             return self.handle_recipe(user_input, session_id)
-        elif "CHAT" in intent:
-            return self.handle_chat(user_input, session_id)
-        elif "FOOD_RELATED" in intent:
-            return self.handle_food_related(user_input, session_id)
+        elif intent in self._food_labels:
+            return self._route_food(user_input, session_id, intent)
         else:
             return self.handle_chat(user_input, session_id)
+
+    @staticmethod
+    def _history_segments(template, **values):
+        """
+        Splits a prompt template around its {history_str} field, for prompts
+        taking the history as its stored token ids. Every line's ids start with
+        its newline (see _line_ids), so that newline is cut from the head.
+        Returns (head, tail), with the other fields filled in.
+        """
+        head, tail = template.split("{history_str}")
+        head = head.format(**values)
+        if head.endswith("\n"):
+            head = head[:-1]
+        return head, tail.format(**values)
+
+    @staticmethod
+    def _first_token_ids(tokenizer, labels):
+        """
+        Token id each label starts with when it's the first thing the assistant
+        says. None if two labels share a first token (no single-token pick).
+        """
+        stub = tokenizer("<|assistant|>", add_special_tokens=False).input_ids
+        ids = []
+        for label in labels:
+            label_ids = tokenizer("<|assistant|>" + label, add_special_tokens=False).input_ids
+            ids.append(label_ids[len(stub)])
+        return ids if len(set(ids)) == len(ids) else None
+
+    def classify(self, model, tokenizer, prompt, labels, prefix=None, cache_key=None):
+        """
+        Picks one of labels for the prompt with a single forward pass: argmax of
+        the next-token logits over each label's first token, no decoding.
+        Falls back to a short generation + string match if the labels can't be
+        told apart by their first token.
+        Results are memoized under cache_key (what the prompt depends on) if given.
+        """
+        if cache_key is not None:
+            key = (labels, cache_key)
+            with self._label_cache_lock:
+                if key in self._label_cache:
+                    self._label_cache.move_to_end(key)
+                    return self._label_cache[key]
+
+            label = self._classify(model, tokenizer, prompt, labels, prefix)
+
+            with self._label_cache_lock:
+                self._label_cache[key] = label
+                while len(self._label_cache) > self.label_cache_size:
+                    self._label_cache.popitem(last=False)
+            return label
+
+        return self._classify(model, tokenizer, prompt, labels, prefix)
+
+    def _classify(self, model, tokenizer, prompt, labels, prefix):
+        label_ids = self._label_ids.get(labels)
+        if label_ids is None:
+            raw = self.run_inference(model, tokenizer, prompt, max_tokens=10, temperature=0.1, prefix=prefix).upper()
+            return next((label for label in labels if label in raw), labels[-1])
+
+        inputs, cache_kwargs = self._prepare_inputs(tokenizer, prompt, prefix)
+        past_key_values = cache_kwargs.get("past_key_values")
+
+        with self._model_lock(model), torch.inference_mode():
+            if past_key_values is not None:
+                # Only the part after the cached preamble goes through the model
+                past_len = past_key_values.get_seq_length()
+                outputs = model(
+                    input_ids=inputs['input_ids'][:, past_len:],
+                    attention_mask=inputs['attention_mask'],
+                    past_key_values=past_key_values,
+                    use_cache=True
+                )
+            else:
+                if self.compile_waiter and model is self.waiter_model:
+                    inputs = self._pad_to_bucket(inputs, tokenizer.pad_token_id)
+                outputs = model(**inputs, use_cache=False)
+            scores = outputs.logits[0, -1, label_ids]
+
+        return labels[int(scores.argmax())]
         
     def handle_chat(self, user_input, session_id):
         """
@@ -132,66 +1295,107 @@ class ChefAI:
         session = self._get_session(session_id)
         
         # History string from SESSION storage
-        history_str = '\n'.join(session['chat_history'])
+        history_str = session['chat_history_str']
 
-        prompt = textwrap.dedent(f"""<|user|>
-        Task: You are the AI Chef.
-        
-        RULES:
-        1. Be warm and friendly, but EXTREMELY CONCISE.
-        2. Answer in 1 or 2 sentences MAXIMUM if a long response is not necessary.
-        3. Do not give long speeches.
-        4. If the user says "Thank you", reply with "You're welcome! Enjoy your meal." or "Bon Appétit!".
-        5. If greeting, just say hello and ask what they want to cook.
+        # Last 2 history lines are the context a cached reply must share
+        context = '\n'.join(list(session['chat_history'])[-2:])
+        cached = self._chat_cache_lookup(context, user_input)
+        if cached is not None:
+            print(f"💾 [DEBUG][{session_id}] Chat cache hit.")
+            self._update_history(session_id, user_input, cached)
+            return cached
 
-        PREVIOUS CONVERSATION:
-        {history_str}
+        prompt = CHAT_TEMPLATE.format(history_str=history_str, user_input=user_input)
 
-        CURRENT USER INPUT: "{user_input}"
-        <|end|><|assistant|>""").strip()
+        # The history goes in as the token ids stored with it, only the
+        # surrounding text is tokenized
+        history_ids = self._history_ids(session, "chat")
+        if history_ids:
+            head, tail = self._history_segments(CHAT_TEMPLATE, user_input=user_input)
+            prompt = SegmentedPrompt([head, history_ids, tail], prompt)
 
         output = self.run_inference(
             model=self.waiter_model,
             tokenizer=self.waiter_tokenizer,
             prompt=prompt,
             max_tokens=100,
-            temperature=0.3
+            temperature=0.3,
+            prefix="chat",
+            stream=True
         )
 
+        self._chat_cache_store(context, user_input, output)
         self._update_history(session_id, user_input, output)
 
         return output
     
+    def _chat_cache_lookup(self, context, user_input):
+        """
+        Returns a cached chat reply for the same context and the same (or a
+        near duplicate) user input, None on a miss.
+        """
+        key = (context, user_input.strip().lower())
+        with self._chat_cache_lock:
+            if key in self._chat_cache:
+                self._chat_cache.move_to_end(key)
+                return self._chat_cache[key][1]
+            candidates = [k for k in self._chat_cache if k[0] == context]
+        if not candidates:
+            return None
+
+        vector = self._unit(self.tools.embed_queries([user_input])[0])
+        with self._chat_cache_lock:
+            candidates = [k for k in candidates if k in self._chat_cache]
+            if not candidates:
+                return None
+            scores = np.stack([self._chat_cache[k][0] for k in candidates]) @ vector
+            best = int(scores.argmax())
+            if scores[best] < self.chat_cache_threshold:
+                return None
+            self._chat_cache.move_to_end(candidates[best])
+            return self._chat_cache[candidates[best]][1]
+
+    def _chat_cache_store(self, context, user_input, reply):
+        vector = self._unit(self.tools.embed_queries([user_input])[0])
+        with self._chat_cache_lock:
+            self._chat_cache[(context, user_input.strip().lower())] = (vector, reply)
+            while len(self._chat_cache) > self.chat_cache_size:
+                self._chat_cache.popitem(last=False)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
     def handle_food_related(self, user_input, session_id):
         """
         Step 1: Sub-classify the intent.
         Step 2: Route to the correct tool or model.
         """
+        # Keyword fast path: only trust it when exactly one sub-intent matches
+        matches = [label for label, rx in self._food_rx.items() if rx.search(user_input)]
+        if len(matches) == 1:
+            print(f"🚦 [DEBUG][{session_id}] Food Sub-Intent (keyword): {matches[0]}")
+            return self._route_food(user_input, session_id, matches[0])
 
         # Sub-routing logic
-        prompt = textwrap.dedent(f"""<|user|>
-        User Input: "{user_input}"
-
-        Task: Classify this specific food related question or request.
-        - "SAFETY": If user input is about food safety, hygiene, storage and dangerous items or if the input user gives can cause safety hazards.
-        - "CONSTANTS": If user input is about unit conversion (imperial/metric), substitutions for ingredients, nutrition macros, or specific ingredient weights or nutrition tables.
-        - "INSTRUCT": If user input is confused about a step in recipe, thinks that it's vague and needs more detail on a technique, or asks a question such as "how do I do step 5?" etc.
-        - "ELSE": If user input is doesn't fit onto any categories on the above, and more vague topics like food history, science or complex food theories etc.
-
-        OUTPUT ONLY ONE CATEGORY NAME: "SAFETY", "CONSTANTS", "INSTRUCT", or "ELSE".<|end|>
-        <|assistant|>""").strip()
+        prompt = FOOD_TEMPLATE.format(user_input=user_input)
 
-        sub_intent = self.run_inference(
-            model=self.waiter_model,
-            tokenizer=self.waiter_tokenizer,
-            prompt=prompt,
-            max_tokens=10
-        ).upper()
+        sub_intent = self.classify(
+            self.waiter_model, self.waiter_tokenizer, prompt, self._food_labels,
+            prefix="food", cache_key=user_input.strip().lower()
+        )
 
         # DEBUG START
         print(f"🚦 [DEBUG][{session_id}] Food Sub-Intent: {sub_intent}")
         # DEBUG END
 
+        return self._route_food(user_input, session_id, sub_intent)
+
+    def _route_food(self, user_input, session_id, sub_intent):
+        """
+        Routes a food related input to the specialist for its sub-intent.
+        """
         # Routing
         if "SAFETY" in sub_intent:
             return self.handle_safety_query(user_input, session_id)
@@ -200,7 +1404,7 @@ class ChefAI:
         elif "INSTRUCT" in sub_intent:
             return self.handle_instruction_query(user_input, session_id)
         else:
-            return self.escalate_to_brain(user_input)
+            return self.escalate_to_brain(user_input, session_id)
         
     def handle_safety_query(self, user_input, session_id):
         """
@@ -212,7 +1416,7 @@ class ChefAI:
         safety_context = self.tools.check_safety(user_input)
         
         # DEBUG START
-        print(f"🛡️ [DEBUG] RAG Safety Context: {str(safety_context)[:100]}...")
+        print(f"🛡️ [DEBUG][{session_id}] RAG Safety Context: {str(safety_context)[:100]}...")
         # DEBUG END
 
         if not safety_context:
@@ -223,27 +1427,15 @@ class ChefAI:
         if session['current_recipe_text']:
             recipe_context = f"\nCURRENT RECIPE STEPS:\n{session['current_recipe_text']}\n"
 
-        prompt = textwrap.dedent(f"""<|user|>
-        User Input: "{user_input}"
-
-        {recipe_context}
-
-        OFFICIAL SAFETY GUIDELINES FOR YOUR USE:
-        {safety_context}
-
-        Task: You're the front model of an AI Chef Agent. As a Chef Instructor, answer
-        the user's question or request about safety politely and strictly based on 
-        the GUIDELINES that given above. If the user refers to a specific step (e.g. "Is step 5 safe?"),
-        USE THE CURRENT RECIPE STEPS above to verify. If the guidelines don't cover it, user your
-        general knowledge but be extremely cautious. 
-        Start with "⚠️ SAFETY FIRST:" if there's a risk.<|end|>
-        <|assistant|>""").strip()
+        prompt = SAFETY_TEMPLATE.format(user_input=user_input, recipe_context=recipe_context, safety_context=safety_context)
 
         output = self.run_inference(
             model=self.waiter_model,
             tokenizer=self.waiter_tokenizer,
             prompt=prompt,
-            max_tokens=200
+            max_tokens=200,
+            prefix="safety",
+            stream=True
         )
 
         return output
@@ -271,31 +1463,16 @@ class ChefAI:
         if not data_context:
             data_context = "No specific context found about the user input. Use your general knowledge in culinary."
         
-        prompt = textwrap.dedent(f"""<|user|>
-        User Input: "{user_input}"
-        
-        {recipe_context}
-
-        REFERENCE DATA (May be irrelevant):
-        {data_context}
-
-        Task: You are a helpful Chef Instructor. Answer the user's request.
-        
-        RULES:
-        1. SCALING: If the user asks to scale (e.g. "for 4 people"), FIRST check the ingredients to guess how many the recipe ALREADY serves. Only increase amounts if necessary.
-        2. SUBSTITUTIONS: If the user asks to replace an ingredient (due to allergy or missing item), suggest a simple, common culinary alternative (e.g. "Use Vegetable Oil or Canola Oil").
-        3. INTELLIGENCE: Use the REFERENCE DATA *only* if it directly answers the question. If the data talks about "Smoke Points" but the user asks about "Allergies", IGNORE THE DATA and use your own knowledge.
-        4. SCALING: If scaling, use the CURRENT RECIPE CONTEXT to calculate numbers.
-        5. Keep it short and helpful.
-        <|end|>
-        <|assistant|>""").strip()
+        prompt = CONSTANTS_TEMPLATE.format(user_input=user_input, recipe_context=recipe_context, data_context=data_context)
 
         output = self.run_inference(
             model=self.waiter_model,
             tokenizer=self.waiter_tokenizer,
             prompt=prompt,
             max_tokens=200,
-            temperature=0.1
+            temperature=0.1,
+            prefix="constants",
+            stream=True
         )
 
         return output
@@ -322,72 +1499,62 @@ class ChefAI:
         else:
             context_str = "No specific recipe loaded."
 
-        prompt = textwrap.dedent(f"""<|user|>
-        CONTEXT: 
-        {context_str}
-
-        User Input: "{user_input}"
-
-        Task: Answer the user's question based ONLY on the context.
-        RULES:
-        1. Ignore any weird formatting in the context.
-        2. If asking for the First Step, look at Step 1 in the recipe.
-        3. If asking for quantities (e.g. "for 3 people"), ESTIMATE based on the ingredients.
-        4. Keep it simple and direct.
-        <|end|>
-        <|assistant|>""").strip()
+        prompt = INSTRUCT_TEMPLATE.format(context_str=context_str, user_input=user_input)
 
         output = self.run_inference(
             model=self.waiter_model,
             tokenizer=self.waiter_tokenizer,
             prompt=prompt,
             max_tokens=256,
-            temperature=0.1 
+            temperature=0.1,
+            prefix="instruct",
+            stream=True
         )
 
         return output
     
-    def escalate_to_brain(self, user_input):
+    @staticmethod
+    def _is_clean_output(text):
         """
-        General explanations don't usually require specific session context.
+        Cheap check that a Brain output can be shown as-is: sane length, no
+        leftover chat-template tags, starts like a sentence and has one.
         """
-        prompt_for_brain = textwrap.dedent(f"""### Instruction:
-        User Input: "{user_input}"
-
-        Task: You're the backend Brain model of an AI Chef Agent. As the Executive chef,
-        provide a detailed explanation for the user's query.
+        return (
+            50 <= len(text) <= 1500
+            and "<|" not in text
+            and text[:1].isupper()
+            and any(mark in text for mark in ".!?")
+        )
 
-        ### Response:
-        """).strip()
+    def escalate_to_brain(self, user_input, session_id="default"):
+        """
+        General explanations don't usually require specific session context,
+        session_id is only used to tag the logs.
+        """
+        prompt_for_brain = BRAIN_TEMPLATE.format(user_input=user_input)
+        mouth_head = f"\n\nUser Input: \"{user_input}\"\n\nExplanation from backend Brain Model:\n"
 
-        explanation = self.run_inference(
-            model=self.chef_model,
-            tokenizer=self.chef_tokenizer,
-            prompt=prompt_for_brain,
-            max_tokens=400,
-            temperature=0.3
-        )
+        explanation, mouth_prefix = self._brain_with_mouth_warmup(prompt_for_brain, mouth_head)
 
         # DEBUG START
-        print(f"🧠 [DEBUG] Brain Escalation Response: {explanation[:150]}...")
+        print(f"🧠 [DEBUG][{session_id}] Brain Escalation Response: {explanation[:150]}...")
         # DEBUG END
 
-        prompt_for_mouth = textwrap.dedent(f"""<|user|>
-        User Input: "{user_input}"
-
-        Explanation from backend Brain Model: 
-        {explanation}
+        if self.skip_clean_rephrase and self._is_clean_output(explanation):
+            print(f"✨ [DEBUG][{session_id}] Brain output is clean, skipping Mouth rephrase.")
+            return explanation
 
-        Task: You're the front model of an AI Chef Agent. Use the explanation provided
-        above from the backend finetuned model, rephrase it if needed to answer the user's
-        question.<|end|>
-        <|assistant|>""").strip()
+        prompt_for_mouth = WAITER_PREFIXES["mouth"] + (
+            f"{mouth_head}{explanation}<|end|>\n<|assistant|>"
+        )
 
         output = self.run_inference(
             model=self.waiter_model,
             tokenizer=self.waiter_tokenizer,
             prompt=prompt_for_mouth,
-            max_tokens=200
+            max_tokens=200,
+            prefix=mouth_prefix,
+            stream=True
         )
 
         return output
@@ -404,39 +1571,21 @@ class ChefAI:
         # Ideation step (Mistral)
         if current_dish:
              print(f"🧠 [DEBUG][{session_id}] Context Found: '{current_dish}'")
-             ideation_prompt = textwrap.dedent(f"""
-             Context: The user is currently cooking "{current_dish}".
-             
-             Input: Make it spicy.
-             Dish: Spicy {current_dish}
-             
-             Input: Remove the vegetables.
-             Dish: {current_dish} (Meat Only)
-
-             Input: I want something else.
-             Dish: [New Dish Name]
-
-             Input: "{user_input}"
-             Dish:""").strip()
+             ideation_prompt = IDEATION_WARM_TEMPLATE.format(current_dish=current_dish, user_input=user_input)
         else:
              # Standard Cold Start Prompt
-             ideation_prompt = textwrap.dedent(f"""
-             Input: I have beef.
-             Dish: Beef Stew
-             
-             Input: I want salmon.
-             Dish: Pan Seared Salmon
-             
-             Input: "{user_input}"
-             Dish:""").strip()
+             ideation_prompt = IDEATION_COLD_TEMPLATE.format(user_input=user_input)
 
         raw_idea = self.run_inference(
             model=self.chef_model,
             tokenizer=self.chef_tokenizer,
             prompt=ideation_prompt,
             max_tokens=50, 
-            temperature=0.1
-        ).strip('"').strip()
+            temperature=0.1,
+            # Only the first line is used, RAG can start as soon as it's out
+            stop_strings=["\n"],
+            prefix=None if current_dish else "ideation"
+        ).strip().strip('"').strip()
 
         if "\n" in raw_idea:
             raw_idea = raw_idea.split("\n")[0]
@@ -449,36 +1598,44 @@ class ChefAI:
         print(f"🧠 [DEBUG][{session_id}] Step 1 - Mistral Raw Idea: '{raw_idea}'")
         # DEBUG END
 
-        # Cleaning step (Phi-3)
-        extraction_prompt = textwrap.dedent(f"""<|user|>
-        Task: Extract the specific food dish name from the Input Text.
-        
-        RULES:
-        1. Remove conversational fillers (e.g. "I suggest", "Here is").
-        2. Keep the full dish name including adjectives (e.g. "Spicy", "Vegan").
-        3. CRITICAL: Do NOT add any new words. Only use words found in the Input Text.
-        4. Output ONLY the cleaned name.
+        # Cleaning step (regex)
+        clean_idea = self._clean_dish_name(raw_idea)
 
-        Text: "{raw_idea}"
-        <|end|><|assistant|>""").strip()
+        if clean_idea:
+            # DEBUG START
+            print(f"🧼 [DEBUG][{session_id}] Step 2 - Regex Cleaned Name: '{clean_idea}'")
+            # DEBUG END
 
-        clean_idea = self.run_inference(
-            model=self.waiter_model,
-            tokenizer=self.waiter_tokenizer,
-            prompt=extraction_prompt,
-            max_tokens=50,
-            temperature=0.1
-        )
+            # Retrieving recipes from RAG
+            dish_recipes = self.tools.get_recipes(clean_idea)
+        else:
+            # RAG lookup on the raw idea runs while the Waiter cleans it up, the
+            # cleaned name is usually the same dish
+            rag_future = self._rag_executor.submit(self.tools.get_recipes, raw_idea)
+
+            # Cleaning step fallback (Phi-3)
+            extraction_prompt = EXTRACTION_TEMPLATE.format(raw_idea=raw_idea)
+
+            clean_idea = self.run_inference(
+                model=self.waiter_model,
+                tokenizer=self.waiter_tokenizer,
+                prompt=extraction_prompt,
+                max_tokens=50,
+                temperature=0.1,
+                prefix="extraction"
+            )
+
+            # DEBUG START
+            print(f"🧼 [DEBUG][{session_id}] Step 2 - Phi-3 Cleaned Name: '{clean_idea}'")
+            # DEBUG END
+
+            # Retrieving recipes from RAG
+            dish_recipes = rag_future.result()
+            if clean_idea.strip().lower() != raw_idea.strip().lower():
+                dish_recipes = self.tools.get_recipes(clean_idea)
 
         # Saving to session
         session['current_dish'] = clean_idea
-
-        # DEBUG START
-        print(f"🧼 [DEBUG][{session_id}] Step 2 - Phi-3 Cleaned Name: '{clean_idea}'")
-        # DEBUG END
-
-        # Retrieving recipes from RAG
-        dish_recipes = self.tools.get_recipes(clean_idea)
         
         # DEBUG START
         if dish_recipes:
@@ -491,33 +1648,17 @@ class ChefAI:
             dish_recipes = "No specific recipes for reference. Use your own knowledge and training."
 
         # Recipe generation (Mistral)
-        recipe_prompt = textwrap.dedent(f"""### Instruction:
-        User Input: "{user_input}"
-        Target Dish: {clean_idea}
+        recipe_prompt = RECIPE_TEMPLATE.format(user_input=user_input, clean_idea=clean_idea, dish_recipes=dish_recipes)
 
-        REFERENCES:
-        {dish_recipes}
+        recipe, plating_prefix = self._recipe_with_plating_warmup(recipe_prompt)
 
-        Task: Write ONE single recipe for {clean_idea}.
-        1. CRITICAL: PRIORITIZE THE USER INPUT INGREDIENTS.
-        2. If References don't match or use different ingredients (e.g. wrong meat), IGNORE THEM and write your own recipe.
-        3. Include Ingredients and Steps.
-        4. DO NOT write a second recipe. STOP after the steps.
+        # Generation stops on a second recipe, the stop string itself is kept in the output
+        for stop in self.recipe_stop_strings:
+            recipe = recipe.split(stop)[0]
+        recipe = recipe.strip()
 
-        ### Response:
-        Title: {clean_idea}
-        """).strip()
-
-        recipe = self.run_inference(
-            model=self.chef_model,
-            tokenizer=self.chef_tokenizer,
-            prompt=recipe_prompt,
-            max_tokens=600,
-            temperature=0.3
-        )
-
-        if len(recipe) > 2500:
-            recipe = recipe[:2500] + "... (truncated)"
+        if len(recipe) > self.recipe_max_chars:
+            recipe = recipe[:self.recipe_max_chars] + "... (truncated)"
 
         # Saving to session
         session['current_recipe_text'] = recipe
@@ -527,22 +1668,16 @@ class ChefAI:
         print(f"      {recipe[:400].replace(chr(10), ' ')}...")
         # DEBUG END
 
+        # Plating in Python when the recipe parses
+        plated = self._plate_recipe(clean_idea, recipe) if self.python_plating else None
+        if plated:
+            print(f"✅ [DEBUG][{session_id}] --- Pipeline Complete (Python plating) ---\n")
+            return plated
+
         # Plating for user (Phi-3)
-        plating_prompt = textwrap.dedent(f"""<|user|>
-        You are a Chef Editor. Format the raw recipe below into clean, readable Markdown.
-        
-        RULES:
-        1. Check the ingredients. If quantities are missing, ESTIMATE standard amounts for 1 PERSON (Single Serving), unless the "User Request" explicitly asks for more.
-        2. Use a Bold Title.
-        3. Use a Bulleted List for Ingredients (ensure every item has a quantity).
-        4. Use a Numbered List for Steps.
-        5. Be polite but brief in the intro.
-        6. CRITICAL: If the raw text contains multiple recipes (e.g. "Option 2"), IGNORE THEM. Only format the FIRST recipe.
-
-        RAW RECIPE: 
-        {recipe}
-        <|end|>
-        <|assistant|>""").strip()
+        plating_prompt = WAITER_PREFIXES["plating"] + (
+            f"\n\nRAW RECIPE:\n{recipe}\n<|end|>\n<|assistant|>"
+        )
 
         output = self.run_inference(
             model=self.waiter_model,
@@ -550,13 +1685,157 @@ class ChefAI:
             prompt=plating_prompt,
             max_tokens=600,
             repeat_penalty=1.05, 
-            temperature=0.2 
+            temperature=0.2,
+            prefix=plating_prefix,
+            stream=True
         )
 
         print(f"✅ [DEBUG][{session_id}] --- Pipeline Complete ---\n")
 
         return output
 
+    def _clean_dish_name(self, raw_idea):
+        """
+        Strips conversational fillers, quotes and end punctuation from the Chef's
+        idea. Returns None when what's left doesn't look like a plain dish name
+        (the Waiter extraction handles those).
+        """
+        match = self._dish_name_rx.match(raw_idea.strip())
+        if not match:
+            return None
+
+        name = match.group(1).strip()
+        if not 2 <= len(name) <= 60 or len(name.split()) > 8 or re.search(r"[:;,\[\]]|\. ", name):
+            return None
+        return name
+
+    def _plate_recipe(self, title, recipe):
+        """
+        Formats the raw Chef recipe into Markdown (bold title, bulleted
+        ingredients, numbered steps). Returns None if it can't be parsed,
+        then the Waiter does the plating.
+        """
+        ingredients = self._ingredients_rx.search(recipe)
+        steps = self._steps_block_rx.search(recipe)
+        if not ingredients or not steps:
+            return None
+
+        ingredient_lines = [
+            self._list_marker_rx.sub("", line).strip()
+            for line in ingredients.group(1).splitlines()
+        ]
+        ingredient_lines = [line for line in ingredient_lines if line]
+
+        step_lines = [
+            self._list_marker_rx.sub("", line).strip()
+            for line in self._step_split_rx.split(steps.group(1))
+        ]
+        step_lines = [line for line in step_lines if line]
+
+        if not ingredient_lines or len(step_lines) < 2:
+            return None
+
+        return "\n".join(
+            [f"**{title}**", "", "**Ingredients**"]
+            + [f"- {line}" for line in ingredient_lines]
+            + ["", "**Steps**"]
+            + [f"{i}. {line}" for i, line in enumerate(step_lines, 1)]
+        )
+
+    def _recipe_with_plating_warmup(self, recipe_prompt):
+        """
+        Generates the Chef recipe while the Waiter prefills the plating prompt:
+        once the ingredients are out (the steps header shows up), the plating
+        preamble is extended with the recipe so far, so plating only prefills
+        the rest. Returns (recipe, plating prefix).
+        """
+        gen_kwargs = {
+            "max_tokens": 500,
+            "temperature": 0.3,
+            "stop_strings": self.recipe_stop_strings,
+            "prefix": "recipe",
+            "max_chars": self.recipe_max_chars
+        }
+        plating_head = "\n\nRAW RECIPE:\n"
+
+        # (with Python plating on, the Waiter plating is the rare fallback; a Waiter
+        # adapter would switch adapters under the running Chef generate)
+        if ("plating" not in self.prefix_cache or not self._local_models or self.python_plating
+                or self.waiter_adapter is not None):
+            recipe = self.run_inference(self.chef_model, self.chef_tokenizer, recipe_prompt, **gen_kwargs)
+            return recipe, "plating"
+
+        streamer, future = self._start_chef_stream(recipe_prompt, gen_kwargs)
+
+        plating_prefix = "plating"
+        partial = ""
+        warmed = False
+        for chunk in streamer:
+            partial += chunk
+            if not warmed and self._steps_rx.search(partial):
+                warmed = True
+                # Cutting before a newline, the rest then tokenizes on its own
+                text = partial.lstrip()
+                cut = text.rfind("\n")
+                if cut > 0:
+                    warm = self._extend_prefix(
+                        self.waiter_model, self.waiter_tokenizer, "plating", plating_head + text[:cut]
+                    )
+                    plating_prefix = warm or "plating"
+
+        return future.result(), plating_prefix
+
+    def _brain_with_mouth_warmup(self, prompt_for_brain, mouth_head):
+        """
+        Generates the Brain explanation while the Waiter prefills the Mouth
+        prompt: every finished line of the explanation is added to the Mouth
+        preamble KV, so a rephrase only prefills the last line.
+        Returns (explanation, mouth prefix).
+        """
+        gen_kwargs = {"max_tokens": 400, "temperature": 0.3, "prefix": "brain"}
+
+        # (a Waiter adapter on the Chef backbone would switch adapters under the
+        # running Chef generate, the two then run one after the other as in _warmup)
+        if "mouth" not in self.prefix_cache or not self._local_models or self.waiter_adapter is not None:
+            explanation = self.run_inference(self.chef_model, self.chef_tokenizer, prompt_for_brain, **gen_kwargs)
+            return explanation, "mouth"
+
+        streamer, future = self._start_chef_stream(prompt_for_brain, gen_kwargs)
+
+        mouth_prefix = "mouth"
+        partial = ""
+        done = 0
+        pending = mouth_head
+        for chunk in streamer:
+            partial += chunk
+            text = partial.lstrip()
+            # Cutting before a newline, the rest then tokenizes on its own
+            cut = text.rfind("\n")
+            if cut > done:
+                warm = self._extend_prefix(self.waiter_model, self.waiter_tokenizer, mouth_prefix, pending + text[done:cut])
+                if warm is None:
+                    break
+                mouth_prefix, pending, done = warm, "", cut
+
+        # (the streamer still has to be drained if the warm-up gave up early)
+        for _ in streamer:
+            pass
+        return future.result(), mouth_prefix
+
+    def _start_chef_stream(self, prompt, gen_kwargs):
+        """
+        Starts a Chef generation in the background. Returns (streamer, future),
+        the streamer yields the new text as it's generated.
+        """
+        streamer = TextIteratorStreamer(self.chef_tokenizer, skip_prompt=True, skip_special_tokens=True)
+        if self.batcher is not None:
+            future = self.batcher.submit(self.chef_model, self.chef_tokenizer, prompt, streamer=streamer, **gen_kwargs)
+        else:
+            future = self._stream_executor.submit(
+                lambda: self._generate(self.chef_model, self.chef_tokenizer, [prompt], streamer=streamer, **gen_kwargs)[0]
+            )
+        return streamer, future
+
 # Main Execution Loop
 if __name__ == "__main__":
     bot = ChefAI()
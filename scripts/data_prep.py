@@ -1,79 +1,72 @@
 import json
+import numpy as np
 import pandas as pd
 
-def get_constraints(row, meal_keywords, diet_keywords, method_keywords, style_keywords):
+def get_constraints(df, meal_keywords, diet_keywords, method_keywords, style_keywords):
     """
-    Extracts dietary constraints from a recipe row based on keywords.
+    Extracts dietary constraints for every recipe based on keywords.
     Args:
-        row (pd.Series): A row from the DataFrame representing a recipe.
-        meal_keywords (list): List of meal-related keywords to look for.
-        diet_keywords (list): List of diet-related keywords to look for.
+        df (pd.DataFrame): The recipe DataFrame ('tags', 'minutes', 'n_steps').
+        meal_keywords (dict): Mapping of meal-related tags to constraints.
+        diet_keywords (dict): Mapping of diet-related tags to constraints.
     Returns:
-        str: A string with constraints.
+        pd.Series: A string with constraints per recipe (aligned with df).
     """
-    constraints = []
-    tags_list = row['tags']
-
-    # Check for meal type keywords
-    for tag in tags_list:
-        if tag in meal_keywords:
-            constraints.append(meal_keywords[tag])
+    # One row per (recipe, tag), looked up in each keyword map
+    tags = df['tags'].reset_index(drop=True).explode()
 
-    # Check for diet type keywords
-    for tag in tags_list:
-        if tag in diet_keywords:
-            constraints.append(diet_keywords[tag])
+    labels = []
+    for rank, keywords in enumerate([meal_keywords, diet_keywords, method_keywords, style_keywords]):
+        matched = tags.map(keywords).dropna()
+        labels.append(pd.DataFrame({'row': matched.index, 'rank': rank, 'label': matched.values}))
 
-    # Check for cooking methods
-    for tag in tags_list:
-        if tag in method_keywords:
-            constraints.append(method_keywords[tag])
-
-    # Check for style keywords
-    for tag in tags_list:
-        if tag in style_keywords:
-            constraints.append(style_keywords[tag])       
+    # Meal, diet, method then style labels, each in tag order
+    labels = pd.concat(labels).sort_values(['row', 'rank'], kind='stable')
+    labels_by_row = labels.groupby('row')['label'].agg(list)
+    labels_by_row = labels_by_row.reindex(range(len(df))).tolist()
 
     # Time constraints
-    if row['minutes'] <= 15:
-        constraints.append("Very Quick")
-    elif row['minutes'] <= 30:
-        constraints.append("Quick")
-    elif row['minutes'] >= 90:
-        constraints.append("Slow Cooked")
+    minutes = df['minutes'].to_numpy()
+    time_labels = np.select(
+        [minutes <= 15, minutes <= 30, minutes >= 90],
+        ["Very Quick", "Quick", "Slow Cooked"],
+        default=""
+    )
 
     # Difficulty constraints
-    if row['n_steps'] <= 5:
-        constraints.append("Easy")
-    elif row['n_steps'] >= 15:
-        constraints.append("Complex")
+    n_steps = df['n_steps'].to_numpy()
+    difficulty_labels = np.select([n_steps <= 5, n_steps >= 15], ["Easy", "Complex"], default="")
 
-    if not constraints:
-        return "General Dish"
+    constraints = []
+    for row_labels, time_label, difficulty_label in zip(labels_by_row, time_labels, difficulty_labels):
+        row_labels = row_labels if isinstance(row_labels, list) else []
+        row_labels += [label for label in (time_label, difficulty_label) if label]
+        constraints.append(", ".join(row_labels) if row_labels else "General Dish")
 
-    return ", ".join(constraints)
+    return pd.Series(constraints, index=df.index)
 
 
-def format_recipe_body(row):
+def format_recipe_body(df):
     """
-    Formats the target output.
+    Formats the target output of every recipe (returns a Series aligned with df).
     """
-
-    ingredients_string = "\n- ".join(row['ingredients'])
-
-    steps_string = ""
-    for i, step in enumerate(row['steps'], start=1):
-        clean_step = step.strip()
-        if clean_step:
-            formatted_step = clean_step[0].upper() + clean_step[1:]
-        else:
-            formatted_step = ""
-            
-        steps_string += f"{i}. {formatted_step}\n"
-
-    name = row['name'].strip()
-
-    return f"**{row['name'].title()}**\n\nIngredients:\n- {ingredients_string}\n\n**Instructions:**\n{steps_string}"
+    recipes = df.reset_index(drop=True)
+
+    ingredients_string = recipes['ingredients'].str.join("\n- ")
+
+    # One row per step, numbered within its recipe
+    steps = recipes['steps'].explode().dropna().str.strip()
+    formatted_steps = steps.str[:1].str.upper() + steps.str[1:]
+    numbers = steps.groupby(level=0).cumcount() + 1
+    step_lines = numbers.astype(str) + ". " + formatted_steps + "\n"
+    steps_string = step_lines.groupby(level=0).agg("".join).reindex(recipes.index, fill_value="")
+
+    body = (
+        "**" + recipes['name'].str.title() + "**\n\nIngredients:\n- " + ingredients_string
+        + "\n\n**Instructions:**\n" + steps_string
+    )
+    body.index = df.index
+    return body
     
 
 def generate_llm_dataset(df, meal_map, diet_map, method_map, style_map, max_length=2048):
@@ -89,21 +82,20 @@ def generate_llm_dataset(df, meal_map, diet_map, method_map, style_map, max_leng
     """
 
     formatted_data = []
-    skipped_count = 0
 
-    for _, row in df.iterrows():
+    constraints_col = get_constraints(df, meal_map, diet_map, method_map, style_map)
+    output_col = format_recipe_body(df)
 
-        constraints = get_constraints(row, meal_map, diet_map, method_map, style_map)
-        output_text = format_recipe_body(row)
+    # Check length constraint
+    keep = (output_col.str.len() <= max_length).to_numpy()
+    skipped_count = int((~keep).sum())
 
-        # Check length constraint
-        if len(output_text) > max_length:
-            skipped_count += 1
-            continue
+    input_col = "Ingredients: " + df['ingredients'].str.join(", ") + ". Context: " + constraints_col
 
+    for input_text, output_text in zip(input_col[keep], output_col[keep]):
         entry = {
             "instruction": "You are a smart chef. Generate a recipe that uses the provided ingredients and strictly follows the context constraints.",
-            "input": f"Ingredients: {', '.join(row['ingredients'])}. Context: {constraints}",
+            "input": input_text,
             "output": output_text + " </s>"
         }
 
@@ -1,9 +1,11 @@
 import streamlit as st
 import requests
 import uuid
+import json
 
 # CONFIGURATION
 API_URL = "http://localhost:8000/chat"
+STREAM_URL = "http://localhost:8000/chat/stream"
 st.set_page_config(page_title="ChefAI", page_icon="👨‍🍳", layout="centered")
 
 # SESSION ID GENERATION (The Ticket Number)
@@ -33,27 +35,33 @@ if prompt := st.chat_input("What's in your fridge?"):
         st.write(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
 
-    # Fetch Response from Backend
+    # Fetch Response from Backend (streamed)
+    def stream_reply(response):
+        """Yields text chunks from the Server-Sent Events stream."""
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
+
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                # Send request to your local API WITH the Session ID
-                payload = {
-                    "text": prompt,
-                    "session_id": st.session_state.session_id
-                }
-                
-                response = requests.post(API_URL, json=payload)
-                
-                if response.status_code == 200:
-                    bot_reply = response.json().get("response", "Error: No response key.")
-                else:
-                    bot_reply = f"Error {response.status_code}: {response.text}"
-            
-            except requests.exceptions.ConnectionError:
-                bot_reply = "🚨 Error: Could not connect to ChefAI backend. Is 'api.py' running?"
-
-        st.write(bot_reply)
+        try:
+            # Send request to your local API WITH the Session ID
+            payload = {
+                "text": prompt,
+                "session_id": st.session_state.session_id
+            }
+
+            with st.spinner("Thinking..."):
+                response = requests.post(STREAM_URL, json=payload, stream=True)
+
+            if response.status_code == 200:
+                bot_reply = st.write_stream(stream_reply(response))
+            else:
+                bot_reply = f"Error {response.status_code}: {response.text}"
+                st.write(bot_reply)
+
+        except requests.exceptions.ConnectionError:
+            bot_reply = "🚨 Error: Could not connect to ChefAI backend. Is 'api.py' running?"
+            st.write(bot_reply)
     
     # Save Assistant Message
     st.session_state.messages.append({"role": "assistant", "content": bot_reply})
\ No newline at end of file
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import ast
+import json
 
 # Constants
 NUTRITION_COLS = ['calories', 'total_fat_pdv', 'sugar_pdv', 'sodium_pdv',
@@ -8,15 +9,13 @@ NUTRITION_COLS = ['calories', 'total_fat_pdv', 'sugar_pdv', 'sodium_pdv',
 
 def parse_nutrition(df):
     """
-    Parses the stringified list in the 'nutrition' column into separate float columns.
+    Parses the stringified list in the 'nutrition' column into separate float columns
+    (float32, plenty for label values and half the memory of float64).
     """
-    temp = df['nutrition'].str[1:-1].str.split(', ', expand=True)
+    temp = df['nutrition'].str[1:-1].str.split(r',\s*', expand=True, regex=True).astype(np.float32)
 
     temp.columns = NUTRITION_COLS
 
-    for col in NUTRITION_COLS:
-        temp[col] = temp[col].astype(float)
-
     return pd.concat([df.drop(columns=['nutrition']), temp], axis=1)
 
 def calculate_nutrition_mass(df):
@@ -44,15 +43,18 @@ def calculate_nutrition_mass(df):
 
     df = df.copy()
 
-    for col, ref_value in daily_values.items():
-        if col in df.columns:
-            #creating new column names (special case for sodium)
-            suffix = '_mg' if 'sodium' in col else '_g'
-            new_col = col.replace('_pdv', suffix)
+    pdv_cols = [col for col in daily_values if col in df.columns]
+    #creating new column names (special case for sodium)
+    new_cols = [col.replace('_pdv', '_mg' if 'sodium' in col else '_g') for col in pdv_cols]
 
-            df[new_col] = (df[col] / 100) * ref_value
+    # All columns in one broadcast multiply
+    pdv = df[pdv_cols].to_numpy(dtype=np.float32)
+    refs = np.array([daily_values[col] for col in pdv_cols], dtype=np.float32)
+    mass = pdv * (refs / 100.0)
+    df[new_cols] = mass
 
-    df['estimated_weight_g'] = df['total_fat_g'] + df['carbs_g'] + df['protein_g']
+    weight_idx = [new_cols.index(col) for col in ['total_fat_g', 'carbs_g', 'protein_g']]
+    df['estimated_weight_g'] = mass[:, weight_idx].sum(axis=1)
 
     return df
 
@@ -98,5 +100,19 @@ def parse_lists(df, columns=[]):
     """
     for col in columns:
         if col in df.columns:
-            df[col] = df[col].apply(ast.literal_eval)
-    return df
\ No newline at end of file
+            df[col] = df[col].map(_parse_list)
+    return df
+
+def _parse_list(text):
+    """
+    Parses one stringified list. Python only double quotes the items that
+    contain an apostrophe, so without any double quote, swapping the quotes
+    gives valid JSON (much faster to parse than ast.literal_eval, which stays
+    as the fallback).
+    """
+    if '"' not in text:
+        try:
+            return json.loads(text.replace("'", '"'))
+        except ValueError:
+            pass
+    return ast.literal_eval(text)
\ No newline at end of file
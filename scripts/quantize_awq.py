@@ -0,0 +1,42 @@
+from unsloth import FastLanguageModel
+import os
+import sys
+
+def merge_lora(model_path, merged_path):
+    """
+    Merges a (Q)LoRA checkpoint into 16-bit weights, AWQ needs full precision weights.
+    """
+    print(f"🔗 Merging LoRA from {model_path}...")
+    model, tokenizer = FastLanguageModel.from_pretrained(
+        model_name=model_path,
+        max_seq_length=2048,
+        load_in_4bit=False
+    )
+    model.save_pretrained_merged(merged_path, tokenizer, save_method="merged_16bit")
+    return merged_path
+
+def quantize_awq(model_path, output_path, w_bit=4, q_group_size=128):
+    """
+    Requantizes a model to AWQ int4 for inference (ChefAI.chef_awq_path /
+    waiter_awq_path). LoRA checkpoints are merged first.
+    """
+    from awq import AutoAWQForCausalLM
+    from transformers import AutoTokenizer
+
+    if os.path.exists(os.path.join(model_path, "adapter_config.json")):
+        model_path = merge_lora(model_path, output_path + "_merged16")
+
+    print(f"⚖️ Quantizing {model_path} to AWQ int{w_bit} (group size {q_group_size})...")
+    model = AutoAWQForCausalLM.from_pretrained(model_path)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+    quant_config = {"zero_point": True, "q_group_size": q_group_size, "w_bit": w_bit, "version": "GEMM"}
+    model.quantize(tokenizer, quant_config=quant_config)
+
+    model.save_quantized(output_path)
+    tokenizer.save_pretrained(output_path)
+    print(f"✅ AWQ checkpoint saved to {output_path}")
+
+if __name__ == "__main__":
+    # python scripts/quantize_awq.py models/mistral_qlora models/mistral_awq
+    quantize_awq(sys.argv[1], sys.argv[2])
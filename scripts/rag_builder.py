@@ -1,5 +1,7 @@
 import pandas as pd
+import torch
 import chromadb
+from sentence_transformers import SentenceTransformer
 from chromadb.utils import embedding_functions
 import os
 import sys
@@ -13,9 +15,12 @@ class RecipeRAGBuilder:
         self.collection_name = collection_name
         self.client = None
         self.collection = None
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.embedding_func = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
+            model_name="all-MiniLM-L6-v2", device=self.device
         )
+        # Same model, used directly to pre-embed documents during ingestion
+        self.embedder = SentenceTransformer("all-MiniLM-L6-v2", device=self.device)
 
     def load_data(self, file_path):
         """
@@ -56,40 +61,55 @@ class RecipeRAGBuilder:
         )
         print(f"✅ Collection '{self.collection_name}' ready.")
 
-    def ingest_batch(self, df, batch_size=500):
+    def ingest_batch(self, df, batch_size=500, embed_batch_size=256):
             if self.collection is None:
                 raise ValueError("❌ DB not initialized. Run initialize_db() first.")
 
             print(f"🚀 Starting Ingestion of {len(df)} items...")
-            
-            for i in range(0, len(df), batch_size):
-                batch = df.iloc[i : i + batch_size]
-                ids, documents, metadatas = [], [], []
 
-                for _, row in batch.iterrows():
-                    ids.append(str(row.get('id', i))) # Fallback to index if no ID
-                    
-                    # Searchable text
-                    name = str(row.get('name', 'Untitled'))
-                    desc = str(row.get('description', ''))
-                    documents.append(f"{name}. {desc[:200]}")
-                    
-                    # Using .get(column, default_value) to prevent KeyErrors
-                    meta = {
-                        "name": name,
-                        "minutes": int(row.get('minutes', 0)),
-                        "calories": float(row.get('calories', 0)),
-                        "protein_g": float(row.get('protein_g', 0)),
-                        "fat_g": float(row.get('total_fat_g', 0)), # This was the crasher!
-                        "sodium_mg": float(row.get('sodium_mg', 0)),
-                        "ingredients": str(row.get('ingredients', '')),
-                        "steps": str(row.get('steps', '')),
-                        "tags": str(row.get('tags', ''))
-                    }
-                    metadatas.append(meta)
+            # Using column(name, default_value) to prevent KeyErrors
+            def column(name, default):
+                if name in df.columns:
+                    return df[name]
+                return pd.Series(default, index=df.index)
+
+            if 'id' in df.columns:
+                ids = df['id'].astype(str).tolist()
+            else:
+                ids = [str(i) for i in range(len(df))] # Fallback to position if no ID
+
+            # Searchable text
+            names = column('name', 'Untitled').astype(str)
+            documents = (names + ". " + column('description', '').astype(str).str[:200]).tolist()
 
-                self.collection.add(ids=ids, documents=documents, metadatas=metadatas)
+            metadatas = pd.DataFrame({
+                "name": names,
+                "minutes": column('minutes', 0).astype(int),
+                "calories": column('calories', 0).astype(float),
+                "protein_g": column('protein_g', 0).astype(float),
+                "fat_g": column('total_fat_g', 0).astype(float), # This was the crasher!
+                "sodium_mg": column('sodium_mg', 0).astype(float),
+                "ingredients": column('ingredients', '').astype(str),
+                "steps": column('steps', '').astype(str),
+                "tags": column('tags', '').astype(str)
+            }).to_dict(orient='records')
+
+            # Embedding everything up front in large batches (on GPU when there
+            # is one) instead of letting Chroma embed each add() call
+            print(f"🧮 Embedding {len(documents)} documents on {self.device}...")
+            embeddings = self.embedder.encode(
+                documents, batch_size=embed_batch_size, convert_to_numpy=True, show_progress_bar=False
+            )
+
+            for i in range(0, len(df), batch_size):
+                end = i + batch_size
+                self.collection.add(
+                    ids=ids[i:end],
+                    documents=documents[i:end],
+                    metadatas=metadatas[i:end],
+                    embeddings=embeddings[i:end].tolist()
+                )
                 if i % (batch_size * 10) == 0 and i > 0:
                     print(f"   Indexed {i} / {len(df)}...")
 
-            print(f"🎉 Ingestion Complete. Total Count: {self.collection.count()}")
\ No newline at end of file
+            print(f"🎉 Ingestion Complete. Total Count: {self.collection.count()}")
@@ -1,72 +1,357 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+import asyncio
 import time
+from bs4 import BeautifulSoup
+import lxml.html
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import re
 import xml.etree.ElementTree as ET
-import json
+import io
+import orjson
+import ast
+import pickle
 import pandas as pd
 import isodate 
 import html
 import uuid
 from fractions import Fraction
+from functools import lru_cache
+from collections import deque
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
 import math
 
 HEADER = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 }
 
-def get_soup(url):
-    """Takes an URL and returns a soup object."""
+# Number pattern of the ingredient/nutrition parsing, compiled once
+NUMBER_RE = re.compile(r"(\d+(?:\.\d+)?)")
+LEADING_NUMBER_RE = re.compile(r"^(\d+(?:\.\d+)?)")
+
+# JSON-LD blocks of a raw page, so recipe pages don't need a soup
+JSONLD_RE = re.compile(
+    rb'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.DOTALL | re.IGNORECASE
+)
+
+# Pages are read in chunks and cut off past this size (inline base64 images,
+# AMP fallbacks...), the recipe data and breadcrumbs come way before that
+MAX_PAGE_BYTES = 512 * 1024
+READ_CHUNK_BYTES = 16 * 1024
+
+# URL lists resolved by sitemap_category_extract, reused between runs
+SITEMAP_MANIFEST_DIR = os.path.join(os.path.dirname(__file__), "../data/sitemap_manifests")
+
+# Shared session for the sync requests: keep-alive connections (no new TCP+TLS
+# handshake per page) and retries with backoff on rate limits / server errors.
+# Responses are cached on disk and served as they are for a week, without
+# asking the site (a page changed meanwhile stays stale until then). Expired
+# entries are re-requested conditionally (ETag / Last-Modified) when the server
+# sent validators. Sitemaps expire sooner, see urls_expire_after.
+# Cache misses are stored in full, get_page()'s cut-off only trims the parsing.
+SESSION = requests_cache.CachedSession(
+    os.path.join(os.path.dirname(__file__), "../data/scraper_cache"),
+    backend='sqlite',
+    expire_after=60 * 60 * 24 * 7,
+    # Sitemaps change about daily: cached for an hour only, so a crawl after
+    # the sitemap manifest expires (see sitemap_category_extract) sees new ones
+    urls_expire_after={'*sitemap*': 60 * 60},
+    allowable_codes=(200,),
+    stale_if_error=True
+)
+SESSION.headers.update(HEADER)
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+def get_page(url, max_bytes=MAX_PAGE_BYTES, until=None):
+    """
+    Takes an URL and returns the raw page (bytes), read in chunks and cut off
+    after max_bytes, or as soon as the `until` regex matches what's been read.
+    """
     try:
         #sending request to the website
-        response = requests.get(url, headers=HEADER, timeout=10)
-
-        #check status
-        if response.status_code == 200:
-            return BeautifulSoup(response.content, 'html.parser')
-        else:
-            print(f"Failed to retrieve {url}: Status code {response.status_code}")
+        with SESSION.get(url, timeout=10, stream=True) as response:
+
+            #check status
+            if response.status_code == 200:
+                page = bytearray()
+                for chunk in response.iter_content(chunk_size=READ_CHUNK_BYTES):
+                    page += chunk
+                    if len(page) >= max_bytes or (until and until.search(page)):
+                        break
+                return bytes(page)
+            else:
+                print(f"Failed to retrieve {url}: Status code {response.status_code}")
 
     except Exception as e:
         print(f"An error occurred while fetching: {e}")
 
     return None
 
-def sitemap_category_extract(sitemap_url, match_string):
+def get_soup(url):
+    """Takes an URL and returns a soup object."""
+    page = get_page(url)
+    if page is None: return None
+    return BeautifulSoup(page, 'lxml')
+
+# "Slow down" answers: the limiter backs off and the request is retried
+THROTTLE_STATUSES = (429, 503)
+
+class RateLimiter:
+    """
+    Adaptive politeness for the async fetch layer, instead of a fixed sleep
+    after every request. Requests start at most `rate` per second, evenly
+    spaced. 429/503 halve the rate and pause with exponential backoff, fast
+    successful responses raise it back step by step, up to max_rate.
+    """
+    def __init__(self, rate=20, min_rate=1, max_rate=None, fast_latency=0.2):
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max_rate or rate * 2
+        self.fast_latency = fast_latency
+
+        self.last_start = 0.0
+        self.backoff = 1.0
+        self.resume_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        """Waits until a new request can start."""
+        async with self.lock:
+            while True:
+                # Re-checked after sleeping, the rate may have changed meanwhile
+                now = time.monotonic()
+                start_at = max(self.resume_at, self.last_start + 1 / self.rate)
+                if now >= start_at:
+                    self.last_start = now
+                    return
+                await asyncio.sleep(start_at - now)
+
+    def update(self, status, latency):
+        """Adapts the rate to a response (status code, seconds until the headers)."""
+        # Responses landing during a pause were sent before it: the rest of a
+        # throttled burst counts as the same event, and doesn't prove recovery
+        if time.monotonic() < self.resume_at:
+            return
+        if status in THROTTLE_STATUSES:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.resume_at = time.monotonic() + self.backoff
+            self.backoff = min(self.backoff * 2, 60.0)
+            print(f"🐢 Throttled ({status}), slowing down to {self.rate:.1f} req/s")
+        elif status == 200:
+            self.backoff = 1.0
+            if latency < self.fast_latency:
+                self.rate = min(self.max_rate, self.rate + 1)
+
+def _robots_max_rate(url):
+    """Max requests/s allowed by the site's robots.txt (Crawl-delay / Request-rate), None if unset."""
+    parts = urlsplit(url)
+    robots = RobotFileParser()
+    try:
+        res = SESSION.get(f"{parts.scheme}://{parts.netloc}/robots.txt", timeout=10)
+        robots.parse(res.text.splitlines())
+    except Exception:
+        return None
+
+    request_rate = robots.request_rate(HEADER['User-Agent'])
+    if request_rate:
+        return request_rate.requests / request_rate.seconds
+    crawl_delay = robots.crawl_delay(HEADER['User-Agent'])
+    if crawl_delay:
+        return 1 / float(crawl_delay)
+    return None
+
+async def _fetch_page(session, semaphore, limiter, url, parse, max_bytes, max_attempts=4):
+    """
+    Fetches one URL within the concurrency limit and the limiter's pace, up to
+    max_bytes of it, and returns parse(body) (or None). Throttled responses
+    (429/503) are retried once the limiter's backoff is over, up to
+    max_attempts requests in total.
+    """
+    async with semaphore:
+        for attempt in range(1, max_attempts + 1):
+            await limiter.wait()
+            start = time.monotonic()
+            try:
+                async with session.get(url) as response:
+                    limiter.update(response.status, time.monotonic() - start)
+                    if response.status in THROTTLE_STATUSES and attempt < max_attempts:
+                        continue
+                    if response.status == 200:
+                        body = bytearray()
+                        async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+                            body += chunk
+                            if len(body) >= max_bytes:
+                                break
+                        body = bytes(body)
+                        # Parsing is CPU work, kept off the event loop
+                        return await asyncio.to_thread(parse, body)
+                    print(f"Failed to retrieve {url}: Status code {response.status}")
+
+            except Exception as e:
+                print(f"An error occurred while fetching: {e}")
+
+            return None
+
+    return None
+
+async def _fetch_pages(urls, parse, concurrency, rate, max_rate, parse_workers, max_bytes):
+    # Pages are parsed on this pool (asyncio.to_thread), capped separately from
+    # the fetches so parsing doesn't starve the event loop of the GIL.
+    # asyncio.run() shuts it down at the end.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=parse_workers))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate=rate, max_rate=max_rate)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=10)
+
+    async with aiohttp.ClientSession(headers=HEADER, connector=connector, timeout=timeout) as session:
+        return await asyncio.gather(*(_fetch_page(session, semaphore, limiter, url, parse, max_bytes) for url in urls))
+
+def fetch_pages(urls, parse, concurrency=20, rate=20, parse_workers=8, max_bytes=MAX_PAGE_BYTES):
+    """
+    Fetches a list of URLs concurrently, at most `concurrency` requests in
+    flight, and runs parse(body) on each page (`parse_workers` threads, while
+    the other fetches keep going). Pages are cut off after max_bytes.
+    Requests start at `rate` per second and adapt to the server (RateLimiter),
+    never above what the site's robots.txt allows.
+    Returns the results (None for failures) in the same order.
+    """
+    if not urls: return []
+
+    max_rate = rate * 2
+    robots_rate = _robots_max_rate(urls[0])
+    if robots_rate:
+        rate, max_rate = min(rate, robots_rate), min(max_rate, robots_rate)
+
+    coroutine = _fetch_pages(urls, parse, concurrency, rate, max_rate, parse_workers, max_bytes)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    # Already inside an event loop (Jupyter), running on a thread with its own
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
+
+def page_links(body):
+    """Returns every <a href> of an HTML page, straight from lxml (no soup)."""
+    return [str(href) for href in lxml.html.fromstring(body).xpath('//a/@href')]
+
+def _parse_sitemap(content, match_string):
+    """
+    Streams the <loc> entries of a sitemap, keeping only the sub-sitemaps of
+    an index or the URLs containing match_string of a urlset. Entries are
+    dropped from the tree as soon as they're read.
+    Returns (is_index, urls).
+    """
+    root, is_index, urls = None, False, []
+    ns = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+    for event, elem in ET.iterparse(io.BytesIO(content), events=('start', 'end')):
+        if root is None:
+            root = elem
+            is_index = elem.tag == ns + 'sitemapindex'
+        elif event == 'end' and elem.tag == ns + 'loc':
+            text = elem.text
+            if text and (('sitemap' in text) if is_index else (match_string in text)):
+                urls.append(text)
+        elif event == 'end' and elem.tag in (ns + 'url', ns + 'sitemap'):
+            root.clear()
+
+    return is_index, urls
+
+def _read_sitemap(url, match_string):
+    """
+    Fetches and parses a sub-sitemap (see _parse_sitemap), None if it
+    couldn't be fetched or parsed.
+    """
+    try:
+        res = SESSION.get(url, timeout=10)
+        return _parse_sitemap(res.content, match_string)
+    except:
+        return None
+
+def _manifest_path(sitemap_url, match_string):
+    parts = urlsplit(sitemap_url)
+    key = re.sub(r'[^A-Za-z0-9]+', '_', parts.netloc + parts.path + parts.query + match_string).strip('_')
+    return os.path.join(SITEMAP_MANIFEST_DIR, f"{key}.pkl")
+
+def sitemap_category_extract(sitemap_url, match_string, max_workers=16, manifest_ttl=60 * 60 * 24):
     """
     Extracts category URLs from a sitemap that contain a specific string.
     
     Args:
         sitemap_index_url (str): The main sitemap URL (e.g., 'https://site.com/sitemap.xml')
         match_string (str): The keyword to filter by (e.g., '/appetizers-and-snacks/')
+        max_workers (int): Number of sub-sitemaps fetched at once.
+        manifest_ttl (int): Seconds the resolved URL list is reused for before
+            the sitemaps are crawled again (0 to always crawl).
     """
+    # Sitemaps change about daily, a recent crawl's result is reused as is
+    manifest_path = _manifest_path(sitemap_url, match_string)
+    if manifest_ttl and os.path.exists(manifest_path) and time.time() - os.path.getmtime(manifest_path) < manifest_ttl:
+        with open(manifest_path, 'rb') as f:
+            urls = pickle.load(f)
+        print(f"📜 Loaded {len(urls)} URLs matching '{match_string}' from the last crawl.")
+        return urls
+
+    urls = _crawl_sitemaps(sitemap_url, match_string, max_workers)
+    if urls:
+        os.makedirs(SITEMAP_MANIFEST_DIR, exist_ok=True)
+        with open(manifest_path, 'wb') as f:
+            pickle.dump(urls, f)
+    return urls
+
+def _crawl_sitemaps(sitemap_url, match_string, max_workers):
     found_categories = set()
 
     print("🗺️  Fetching Sitemap Index...")
     try:
-        response = requests.get(sitemap_url, headers=HEADER, timeout=10)
+        response = SESSION.get(sitemap_url, timeout=10)
 
-        root = ET.fromstring(response.content)
-        namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
+        is_index, sub_sitemaps = _parse_sitemap(response.content, match_string)
+        if not is_index:
+            # Plain urlset, the matching pages are already there
+            print(f"✅ Found {len(set(sub_sitemaps))} URLs matching '{match_string}'.")
+            return list(set(sub_sitemaps))
 
-        sub_sitemaps = [loc.text for loc in root.findall('.//ns:loc', namespace)]
         print(f"🔍 Found {len(sub_sitemaps)} sub-sitemaps. Scanning for Appetizers and Snacks...")
 
-        for sitemap in sub_sitemaps:
-            if 'sitemap' not in sitemap: 
-                continue
+        # Breadth-first over the sitemaps, nested sitemap indexes included,
+        # each sitemap fetched once. A level's sitemaps are fetched in parallel
+        # (I/O bound, threads release the GIL while waiting).
+        queue = deque(sub_sitemaps)
+        visited = set(queue) | {sitemap_url}
 
-            try:
-                res = requests.get(sitemap, headers=HEADER, timeout=10)
-                sub_root = ET.fromstring(res.content)
-                urls = [loc.text for loc in sub_root.findall('.//ns:loc', namespace)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while queue:
+                level = list(queue)
+                queue.clear()
 
-                for url in urls:
-                    if match_string in url:
-                        found_categories.add(url)
+                for result in pool.map(lambda sitemap: _read_sitemap(sitemap, match_string), level):
+                    if result is None:
+                        continue
+                    is_index, urls = result
 
-            except:
-                continue
+                    # An index lists more sitemaps, a urlset lists pages
+                    if is_index:
+                        for url in urls:
+                            if url not in visited:
+                                visited.add(url)
+                                queue.append(url)
+                        continue
+
+                    found_categories.update(urls)
 
         print(f"✅ Found {len(found_categories)} URLs matching '{match_string}'.")
         return list(found_categories)
@@ -76,41 +361,59 @@ def sitemap_category_extract(sitemap_url, match_string):
         return []
     
 
-def recipe_harvester(category_urls, url_pattern, exclude_substrings=[]):
+def recipe_harvester(category_urls, url_pattern, exclude_substrings=[], concurrency=20, seen_path=None):
     """
     Harvests URLs from category pages that match a specific Regex pattern.
     Args:
         category_urls (list): List of category page URLs to scrape.
         url_pattern (re.Pattern): Compiled regex pattern to match recipe URLs.
+        concurrency (int): Number of category pages fetched at once.
+        seen_path (str): Optional pickle of the recipes harvested by earlier runs.
+            Those are skipped (only new recipes are returned) and the file is
+            updated with this run's.
     """
+    # Same category listed twice = same page fetched twice
+    category_urls = list(dict.fromkeys(category_urls))
+
     unique_recipes = set()
+    seen = set()
+    if seen_path and os.path.exists(seen_path):
+        with open(seen_path, 'rb') as f:
+            seen = pickle.load(f)
+        print(f"📜 Skipping {len(seen)} recipes from earlier runs.")
+
+    # Every link checked once, recipes repeat across category pages
+    checked = set(seen)
     total = len(category_urls)
 
     print(f"🚜 Starting Harvest on {total} categories...")
+    # Only the links are needed, no soup is built for the category pages
+    pages = fetch_pages(category_urls, page_links, concurrency=concurrency)
 
-    for category_url in category_urls:
+    for category_url, links in zip(category_urls, pages):
         print(f"📂 Processing category: {category_url}")
-        soup = get_soup(category_url)
-        if not soup:
+        if links is None:
             print(f"Skipping category due to fetch error: {category_url}")
             continue
 
-        links = soup.find_all('a', href=True)
-        for link in links:
-            href = link['href']
-
+        for href in links:
             # Strip query parameters to avoid duplicates
             href = href.split('?')[0]
 
+            if href in checked:
+                continue
+            checked.add(href)
+
             if any(ex in href for ex in exclude_substrings):
                 continue
                                 
             if url_pattern.search(href):
                 unique_recipes.add(href)
 
-        time.sleep(0.3)
-
     print(f"✅ Harvested {len(unique_recipes)} unique recipes.")
+    if seen_path:
+        with open(seen_path, 'wb') as f:
+            pickle.dump(seen | unique_recipes, f)
     return list(unique_recipes)
 
 
@@ -123,18 +426,23 @@ def scrape_recipe_details(url):
     Returns:
         dict: A dictionary containing recipe details or None if failed.
     """
-    soup = get_soup(url)
-    if not soup:
+    # Stops downloading once the first JSON-LD block is in
+    page = get_page(url, until=JSONLD_RE)
+    if not page:
         return None
     
-    script = soup.find('script', {'type': 'application/ld+json'})
+    # JSON-LD straight from the bytes, a soup only if the regex misses it
+    blocks = JSONLD_RE.findall(page)
+    if not blocks:
+        script = BeautifulSoup(page, 'lxml').find('script', {'type': 'application/ld+json'})
+        blocks = [script.string] if script else []
     
-    if not script:
+    if not blocks:
         print(f"⚠️ JSON-LD not found: {url}")
         return None
 
     try:
-        json_content = json.loads(script.string)
+        json_content = orjson.loads(blocks[0])
         recipe_data = None
 
         if isinstance(json_content, list):
@@ -188,6 +496,11 @@ def float_to_cooking_fraction(val):
     Converts float values to cooking fractions.
     e.g, 0.33333 -> 1/3, 1.5 -> 1 1/2, 0.5 -> 1/2
     """
+    # Quantities repeat a lot (1/2, 1/3, 1 1/2...), rounded so they share cache entries
+    return _cooking_fraction(round(val, 4))
+
+@lru_cache(maxsize=1024)
+def _cooking_fraction(val):
     if val == 0: return "0"
     
     # If very close to an integer, round it
@@ -218,9 +531,15 @@ def format_ingredient_string(text):
     e.g, "0.5 cup sugar" -> "1/2 cup sugar"
     """
     if not isinstance(text, str): return text
-    
+
+    # Fast path: no leading digit, nothing to convert
+    if not text[:1].isdigit(): return text
+    return _format_ingredient_string(text)
+
+@lru_cache(maxsize=4096)
+def _format_ingredient_string(text):
     # Regex: Capture the leading float or integer
-    match = re.match(r"^(\d+(\.\d+)?)", text)
+    match = LEADING_NUMBER_RE.match(text)
     if match:
         num_str = match.group(1)
         try:
@@ -232,31 +551,147 @@ def format_ingredient_string(text):
             return text
     return text
 
+def format_ingredients(ingredient_lists):
+    """
+    format_ingredient_string() over a Series of ingredient lists. The leading
+    numbers of all ingredients are extracted in one pass and each distinct
+    quantity is converted to a fraction only once.
+    """
+    lists = ingredient_lists[ingredient_lists.map(len) > 0]
+    ings = lists.explode()
+
+    num_strs = ings.str.extract(LEADING_NUMBER_RE, expand=False)
+    # Plain boolean array, the exploded index repeats labels
+    has_num = num_strs.notna().to_numpy()
+    num_strs = num_strs[has_num]
+
+    fractions = {s: float_to_cooking_fraction(float(s)) for s in num_strs.unique()}
+    ings[has_num] = [
+        fractions[s] + text[len(s):] for s, text in zip(num_strs, ings[has_num])
+    ]
+
+    # Back to one list per recipe, empty ones included
+    formatted = ings.groupby(level=0, sort=False).agg(list)
+    formatted = formatted.reindex(ingredient_lists.index)
+    return formatted.map(lambda x: x if isinstance(x, list) else [])
+
+def normalize_tags(tag_lists, replacements):
+    """
+    Cleans a Series of raw tag lists (categories, cuisines, breadcrumbs) with
+    vectorised string ops over all the tags at once: lowercased, stripped,
+    " recipe(s)" dropped, renamed with `replacements` and deduplicated per recipe.
+    """
+    tag_df = tag_lists.explode().dropna().rename('tag').rename_axis('row').reset_index()
+
+    tags = tag_df['tag'].astype(str).str.lower().str.strip()
+    keep = ~tags.isin(['nan', 'recipe', 'recipes', ''])
+    tags = tags[keep].str.replace(' recipes', '', regex=False).str.replace(' recipe', '', regex=False)
+    tags = tags.map(replacements).fillna(tags)
+
+    tag_df = pd.DataFrame({'row': tag_df['row'][keep], 'tag': tags}).drop_duplicates()
+    per_row = tag_df.groupby('row', sort=False)['tag'].agg(list)
+    per_row = per_row.reindex(tag_lists.index)
+    return per_row.map(lambda x: x if isinstance(x, list) else [])
+
 def fetch_recipe_data(url):
-    soup = get_soup(url)
-    if not soup: return None
+    page = get_page(url)
+    if not page: return None
+    return _recipe_data_from_page(page)
+
+def fetch_recipes_data(urls, concurrency=20, rate=10):
+    """
+    fetch_recipe_data() over a list of URLs, `concurrency` pages at a time.
+    Returns the results of the pages that could be fetched.
+    """
+    results = fetch_pages(urls, _recipe_data_from_page, concurrency=concurrency, rate=rate)
+    return [result for result in results if result]
+
+def _find_recipe(data):
+    """Returns the Recipe object of a parsed JSON-LD block (or None)."""
+    if isinstance(data, list):
+        for item in data:
+            if 'Recipe' in item.get('@type', []):
+                return item
+    elif isinstance(data, dict):
+        if 'Recipe' in data.get('@type', []): return data
+    return None
+
+def _recipe_data_from_page(page):
+    """
+    Cuts the JSON-LD out of the raw page with JSONLD_RE, no soup is built.
+    Pages where the regex finds nothing go through BeautifulSoup instead.
+    """
+    blocks = JSONLD_RE.findall(page)
+    if not blocks:
+        return _recipe_data_from_soup(BeautifulSoup(page, 'lxml'))
+
+    result = {'soup': None, 'json': None, 'breadcrumbs': []}
+    for block in blocks:
+        try: result['json'] = _find_recipe(orjson.loads(block))
+        except: pass
+        if result['json']: break
+
+    # Only the breadcrumb texts are kept, not the page (recipes only, with lxml)
+    if result['json']:
+        tree = lxml.html.fromstring(page)
+        result['breadcrumbs'] = [b.text_content() for b in tree.find_class('mntl-breadcrumbs__link')]
+    return result
+
+def _recipe_data_from_soup(soup):
     result = {'soup': soup, 'json': None}
     
     script = soup.find('script', {'type': 'application/ld+json'})
     if script:
-        try:
-            data = json.loads(script.string)
-            if isinstance(data, list):
-                for item in data:
-                    if 'Recipe' in item.get('@type', []):
-                        result['json'] = item
-                        break
-            elif isinstance(data, dict):
-                 if 'Recipe' in data.get('@type', []): result['json'] = data
+        try: result['json'] = _find_recipe(orjson.loads(script.string))
         except: pass
     return result
 
-def process_recipes_to_final_format(raw_results_list, FDA_DAILY_VALUES, TAG_REPLACEMENTS):
+def _breadcrumbs(raw_item):
+    """Breadcrumb texts of a fetched recipe, read at fetch time or from its soup."""
+    if 'breadcrumbs' in raw_item:
+        return raw_item['breadcrumbs']
+
+    soup = raw_item.get('soup')
+    if soup:
+        return [b.get_text() for b in soup.select('.mntl-breadcrumbs__link')]
+    return []
+
+def _for_worker(raw_item):
+    """
+    Slims a raw result down for a worker process: the JSON-LD and the
+    breadcrumb texts, soups are heavy to pickle.
+    """
+    if not raw_item.get('json'): return None
+    return {'json': raw_item['json'], 'breadcrumbs': _breadcrumbs(raw_item)}
+
+def process_recipes_to_final_format(raw_results_list, FDA_DAILY_VALUES, TAG_REPLACEMENTS, workers=None, chunk_size=500):
+    """
+    Turns fetch_recipes_data() results into the final recipes DataFrame.
+    The recipes are processed in chunks of chunk_size on `workers` processes
+    (all the cores by default), the work is pure CPU and independent per recipe.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(raw_results_list) <= chunk_size:
+        return _process_chunk(raw_results_list, FDA_DAILY_VALUES, TAG_REPLACEMENTS)
+
+    items = [item for item in map(_for_worker, raw_results_list) if item]
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    print(f"⚙️ Processing {len(items)} recipes on {workers} processes...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        dfs = list(pool.map(
+            _process_chunk, chunks,
+            [FDA_DAILY_VALUES] * len(chunks), [TAG_REPLACEMENTS] * len(chunks)
+        ))
+
+    # Keeps the empty frame's columns when nothing made it through
+    return pd.concat(dfs, ignore_index=True) if dfs else _process_chunk([], FDA_DAILY_VALUES, TAG_REPLACEMENTS)
+
+def _process_chunk(raw_results_list, FDA_DAILY_VALUES, TAG_REPLACEMENTS):
     processed_rows = []
     
     for raw_item in raw_results_list:
         json_data = raw_item.get('json')
-        soup = raw_item.get('soup')
         if not json_data: continue 
         
         row = json_data.copy()
@@ -281,15 +716,17 @@ def process_recipes_to_final_format(raw_results_list, FDA_DAILY_VALUES, TAG_REPL
         }
         nutri_data = row.get('nutrition', {})
         if isinstance(nutri_data, str):
-            import ast
-            try: nutri_data = ast.literal_eval(nutri_data)
-            except: nutri_data = {}
+            # JSON-LD is JSON, literal_eval only for Python-style dict strings
+            try: nutri_data = orjson.loads(nutri_data)
+            except ValueError:
+                try: nutri_data = ast.literal_eval(nutri_data)
+                except: nutri_data = {}
             
         for target, keys in nutrition_map.items():
             row[target] = 0.0
             for k in keys:
                 val = nutri_data.get(k)
-                match = re.search(r"(\d+(\.\d+)?)", str(val))
+                match = NUMBER_RE.search(str(val))
                 if match:
                     row[target] = float(match.group(1))
                     break
@@ -298,43 +735,22 @@ def process_recipes_to_final_format(raw_results_list, FDA_DAILY_VALUES, TAG_REPL
         for pdv_col, (mass_col, ref_val) in FDA_DAILY_VALUES.items():
             row[pdv_col] = round((row[mass_col] / ref_val) * 100, 1)
 
-        # Generate Tags
-        tags = set()
-        def clean_and_add_tag(val):
-            if pd.isna(val) or val is None or val == "": return
-            s_val = str(val).lower().strip()
-            if s_val in ["nan", "recipe", "recipes"]: return
-            s_val = s_val.replace(" recipes", "").replace(" recipe", "")
-            final_tag = TAG_REPLACEMENTS.get(s_val, s_val)
-            tags.add(final_tag)
-
-        cats = row.get('recipeCategory')
-        if isinstance(cats, list): 
-            for c in cats: clean_and_add_tag(c)
-        else: clean_and_add_tag(cats)
-        
-        cuis = row.get('recipeCuisine')
-        if isinstance(cuis, list):
-            for c in cuis: clean_and_add_tag(c)
-        else: clean_and_add_tag(cuis)
-        
-        if soup:
-            breadcrumbs = soup.select('.mntl-breadcrumbs__link')
-            for b in breadcrumbs: clean_and_add_tag(b.get_text())
+        # Collect Tags (cleaned for all recipes at once, see normalize_tags)
+        raw_tags = []
+        for field in ('recipeCategory', 'recipeCuisine'):
+            vals = row.get(field)
+            raw_tags.extend(vals if isinstance(vals, list) else [vals])
+        raw_tags.extend(_breadcrumbs(raw_item))
 
-        row['tags'] = list(tags)
+        row['tags'] = raw_tags
 
         # Cleanup & Format Ingredients
         row['name'] = row.get('name', 'Unknown Recipe')
         if pd.isna(row['name']): row['name'] = 'Unknown'
         
-        raw_ingreds = row.get('recipeIngredient', [])
-        clean_ingreds = []
-        for ing in raw_ingreds:
-            clean_ingreds.append(format_ingredient_string(ing))
-            
-        row['ingredients'] = clean_ingreds
-        row['n_ingredients'] = len(clean_ingreds)
+        # Quantities are converted for all recipes at once (format_ingredients)
+        row['ingredients'] = row.get('recipeIngredient', [])
+        row['n_ingredients'] = len(row['ingredients'])
         
         # Format Steps
         raw_steps = row.get('recipeInstructions', [])
@@ -352,17 +768,21 @@ def process_recipes_to_final_format(raw_results_list, FDA_DAILY_VALUES, TAG_REPL
 
         processed_rows.append(row)
 
-    df = pd.DataFrame(processed_rows)
     target_cols = [
         'name', 'id', 'minutes', 'tags', 'n_steps', 'steps', 'description', 
         'ingredients', 'n_ingredients', 'calories', 
         'total_fat_pdv', 'sugar_pdv', 'sodium_pdv', 'protein_pdv', 'sat_fat_pdv', 'carbs_pdv', 
         'total_fat_g', 'sugar_g', 'sodium_mg', 'protein_g', 'sat_fat_g', 'carbs_g'
     ]
-    
-    if not df.empty:
-        for col in target_cols:
-            if col not in df.columns: df[col] = None
-        return df[target_cols]
-    else:
-        return pd.DataFrame(columns=target_cols)
\ No newline at end of file
+    nutrition_cols = target_cols[9:]
+
+    # Built straight into the final columns (missing ones come out empty)
+    df = pd.DataFrame.from_records(processed_rows, columns=target_cols)
+    if df.empty:
+        return df
+
+    df['ingredients'] = format_ingredients(df['ingredients'])
+    df['tags'] = normalize_tags(df['tags'], TAG_REPLACEMENTS)
+    # 1 decimal at most, float32 is plenty and half the memory
+    df[nutrition_cols] = df[nutrition_cols].astype('float32')
+    return df
\ No newline at end of file